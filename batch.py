@@ -0,0 +1,197 @@
+# batch.py
+"""
+Batch recommendations for stored user profiles.
+
+    python batch.py profiles.jsonl -o recommendations.jsonl --processes 8
+
+Each input line is a JSON object with the seven preference fields
+(category, author, keywords, target_audience, book_type, language,
+rating) and an optional "id". Keywords may be a list or a comma-separated
+string. Each output line carries the id plus the tier, message and the
+first --limit ranked recommendations (with the cursor of the next page and
+the total), in input order. A line that is not a valid profile gets an
+output line with its id and an "error" instead, and the run carries on.
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from cache import ResultCache, cached_recommend, canonical_params, params_from_key
+from catalog import get_catalog
+from controller import PAGE_SIZE
+from loader import load_catalog
+from recommender import ENGINES, EnginePool
+
+# Profiles read, deduplicated and sent to a worker at a time
+CHUNK_SIZE = 1000
+
+# Per-process state: the compiled catalog, one warm engine and a result
+# cache that lets repeated profiles across chunks skip the pipeline
+_worker = {}
+
+
+def profile_params(profile):
+    """user_params dict from one input record; raises ValueError for records that aren't valid profiles"""
+    if not isinstance(profile, dict):
+        raise ValueError("not a JSON object")
+    keywords = profile.get("keywords") or []
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    elif not isinstance(keywords, (list, tuple, set)):
+        raise ValueError(f"invalid keywords {keywords!r}")
+    rating = profile.get("rating")
+    if rating in (None, ""):
+        rating = None
+    else:
+        try:
+            rating = float(rating)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid rating {rating!r}") from None
+        if not math.isfinite(rating):
+            raise ValueError(f"invalid rating {rating!r}")
+    return {
+        "category": profile.get("category"),
+        "author": profile.get("author"),
+        "keywords": set(keywords),
+        "target_audience": profile.get("target_audience"),
+        "book_type": profile.get("book_type"),
+        "language": profile.get("language"),
+        "rating": rating,
+    }
+
+
+def _init_worker(cache_size, catalog_path=None, engine=None):
+    catalog = load_catalog(catalog_path)[0] if catalog_path else get_catalog()
+    _worker["pool"] = EnginePool(catalog, size=1, mode=engine)
+    _worker["cache"] = ResultCache(maxsize=cache_size, ttl=float("inf"))
+
+
+def _score_keys(keys, limit=PAGE_SIZE):
+    """Worker side: one result payload, the first `limit` items, per distinct canonical profile"""
+    pool, cache = _worker["pool"], _worker["cache"]
+    payloads = []
+    for key in keys:
+        payloads.append(cached_recommend(params_from_key(key), cache, pool=pool).as_dict(0, limit))
+    return payloads
+
+
+def _chunks(profiles, size):
+    profiles = iter(profiles)
+    while True:
+        chunk = list(islice(profiles, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prepare(chunk):
+    """Distinct canonical keys of a chunk, and each profile's position among
+    them, or the error payload of a profile that can't be scored"""
+    positions = {}
+    slots = []
+    for profile in chunk:
+        try:
+            key = canonical_params(profile_params(profile))
+        except (ValueError, TypeError) as error:
+            slots.append({"error": f"invalid profile: {error}"})
+            continue
+        slots.append(positions.setdefault(key, len(positions)))
+    return list(positions), slots
+
+
+def _payloads(chunk, slots, payloads):
+    for profile, slot in zip(chunk, slots):
+        yield profile, payloads[slot] if isinstance(slot, int) else slot
+
+
+def recommend_batch(profiles, processes=None, chunk_size=CHUNK_SIZE, cache_size=10_000, catalog_path=None,
+                    engine=None, limit=PAGE_SIZE):
+    """Yield (profile, result payload) for every profile, in input order.
+
+    Profiles are consumed lazily in chunks. Identical profiles within a
+    chunk are scored once; repeats across chunks hit the worker's cache.
+    Each payload holds the first `limit` recommendations; an invalid
+    profile gets {"error": ...} instead. With processes=1 everything runs
+    in this process. `catalog_path` loads a CSV/JSONL/.snap catalog (see
+    loader.py) instead of the books in facts.py; `engine` picks the engine
+    implementation (see recommender.engine_class).
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        _init_worker(cache_size, catalog_path, engine)
+        for chunk in _chunks(profiles, chunk_size):
+            keys, slots = _prepare(chunk)
+            yield from _payloads(chunk, slots, _score_keys(keys, limit))
+        return
+
+    with ProcessPoolExecutor(processes, initializer=_init_worker,
+                             initargs=(cache_size, catalog_path, engine)) as executor:
+        # Keep a bounded number of chunks in flight so input is never read ahead unboundedly
+        in_flight = deque()
+        for chunk in _chunks(profiles, chunk_size):
+            keys, slots = _prepare(chunk)
+            in_flight.append((chunk, slots, executor.submit(_score_keys, keys, limit)))
+            if len(in_flight) >= processes * 2:
+                yield from _drain(in_flight.popleft())
+        while in_flight:
+            yield from _drain(in_flight.popleft())
+
+
+def _drain(entry):
+    chunk, slots, future = entry
+    return _payloads(chunk, slots, future.result())
+
+
+def read_profiles(lines):
+    """Parsed input records; a line that isn't valid JSON comes through as its text and is reported as an error"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score stored user profiles in batch.")
+    parser.add_argument("input", help="JSONL file of user preference records ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("-p", "--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE,
+                        help=f"recommendations per profile (default: {PAGE_SIZE})")
+    parser.add_argument("--catalog", default=None, help="CSV/JSONL/.snap catalog file (default: facts.py)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=None,
+                        help="engine implementation (default: $LIBRARY_ENGINE or index)")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    count = errors = 0
+    try:
+        for profile, payload in recommend_batch(read_profiles(source), args.processes, args.chunk_size,
+                                                  catalog_path=args.catalog, engine=args.engine, limit=args.limit):
+            profile_id = profile.get("id") if isinstance(profile, dict) else None
+            sink.write(json.dumps(dict(payload, id=profile_id), ensure_ascii=False) + "\n")
+            count += 1
+            errors += "error" in payload
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    elapsed = time.perf_counter() - start
+    print(f"📊 {count} profiles in {elapsed:.1f}s ({count / elapsed if elapsed else 0:.0f}/s), {errors} invalid",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
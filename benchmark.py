@@ -0,0 +1,931 @@
+# benchmark.py
+"""
+Micro-benchmarks for the recommendation engine.
+
+    python benchmark.py exact [sizes...]
+    python benchmark.py scoring [sizes...]
+    python benchmark.py pool [thread counts...]
+    python benchmark.py load [sizes...]
+    python benchmark.py snapshot [sizes...]
+    python benchmark.py dedupe [sizes...]
+    python benchmark.py updates [sizes...]
+    python benchmark.py rete [sizes...]
+    python benchmark.py keywords [vocabulary sizes...]
+    python benchmark.py tiers [sizes...]
+    python benchmark.py pages [sizes...]
+    python benchmark.py render [page sizes...]
+    python benchmark.py reruns [sizes...]
+    python benchmark.py service [concurrent clients...]
+    python benchmark.py metrics [sizes...]
+    python benchmark.py books [sizes...]
+    python benchmark.py payloads [page sizes...]
+    python benchmark.py explain [query keyword counts...]
+    python benchmark.py suite [sizes...] [--save]
+
+Synthetic catalogs come from synthetic.py, which draws plain dicts (every
+engine code path accepts them alongside BookFact objects) from the
+distributions of the books in facts.py.
+
+`suite` is the scaling benchmark: the fixed QUERY_MIX through recommend() on
+generated catalogs of 1k to 1M books (pass 10000000 for 10M, given the RAM),
+each in a fresh process. It reports throughput, p50/p99 latency and peak
+RSS against the baselines in benchmark_baselines.json and exits non-zero on
+a regression; --save records the current numbers as the new baselines.
+"""
+import asyncio
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from catalog import (Catalog, CatalogIndex, book_value, compile_book, compile_query, dedupe_records,
+                     expanded_keywords, normalize_kw, normalize_text)
+from controller import converFact_to_string, explain_match, explain_recommendations
+from facts import Book, BookFact, knowledge_base
+from keywords import KeywordIndex
+from metrics import metrics
+from ranking import rank
+from recommender import EnginePool, recommend
+from cache import ResultCache, SessionMemo, cached_recommend
+from render import page_markdown, render_page
+from server import RecommendationService, serve
+from synthetic import QUERY_MIX, synthetic_books
+from scoring import (alternative_score, alternative_upper_bound, fallback_score, fallback_total, partial_match,
+                     rank_alternatives, rank_fallback, score_tiers)
+
+
+def synthetic_catalog(size, seed=0):
+    """Build `size` book dicts shaped like the sample catalog"""
+    return list(synthetic_books(size, seed))
+
+
+def scan_exact_match(books, category=None, author=None, target_audience=None,
+                     language=None, book_type=None, keywords=None, rating=None):
+    """The original exact_match loop (without the debug output), for comparison"""
+    keywords_norm = normalize_kw(keywords)
+    matched = []
+    for i, book in enumerate(books):
+        if category and normalize_text(book_value(book, "category", "")) != normalize_text(category):
+            continue
+        if author and normalize_text(book_value(book, "author", "")) != normalize_text(author):
+            continue
+        if target_audience and normalize_text(book_value(book, "target_audience", "")) != normalize_text(target_audience):
+            continue
+        if language and normalize_text(book_value(book, "language", "")) != normalize_text(language):
+            continue
+        if book_type and normalize_text(book_value(book, "book_type", "")) != normalize_text(book_type):
+            continue
+        if keywords_norm and not any(kw in normalize_kw(book_value(book, "keywords", set())) for kw in keywords_norm):
+            continue
+        if rating and abs(float(book_value(book, "rating", 0.0)) - float(rating)) > 0.5:
+            continue
+        matched.append(i)
+    return matched
+
+
+def sample_queries(books):
+    """A fixed query mix: selective, broad, keyword-only and rating-only"""
+    probe = books[len(books) // 2]
+    return [
+        {"author": probe["author"]},
+        {"category": probe["category"], "keywords": probe["keywords"], "rating": probe["rating"]},
+        {"category": "Technology", "keywords": {"ai"}, "language": "English", "rating": 4.5},
+        {"keywords": {"python", "programming"}},
+        {"target_audience": "Teens", "book_type": "Hardcover", "rating": 4.0},
+        {"rating": 4.9},
+    ]
+
+
+# Misspelled, abbreviated and differently written forms of the sample keywords
+FUZZY_QUERIES = [
+    {"keywords": {"ML"}},
+    {"keywords": {"Machine-Learning", "pyth"}, "rating": 4.5},
+    {"category": "Technology", "keywords": {"artifical inteligence"}},
+    {"keywords": {"programing", "AI"}, "language": "English"},
+]
+
+
+def _timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def bench_exact(sizes):
+    print(f"{'books':>10} {'build s':>9} {'scan ms':>10} {'index ms':>10} {'speedup':>8}")
+    for size in sizes:
+        books = synthetic_catalog(size)
+        build_start = time.perf_counter()
+        index = CatalogIndex([compile_book(book) for book in books])
+        build_time = time.perf_counter() - build_start
+
+        scan_total = index_total = 0.0
+        for query in sample_queries(books):
+            scan_time, expected = _timed(lambda: scan_exact_match(books, **query), 1)
+            index_time, got = _timed(lambda: index.exact_candidates(compile_query(query)), 3)
+            assert got == expected, f"index result differs from scan for {query}"
+            scan_total += scan_time
+            index_total += index_time
+
+        print(f"{size:>10} {build_time:>9.2f} {scan_total * 1000:>10.1f} "
+              f"{index_total * 1000:>10.2f} {scan_total / index_total:>7.0f}x")
+
+
+def bench_scoring(sizes):
+    """Per-book loop + heap against one vectorized NumPy pass, for both scorers"""
+    print(f"{'books':>10} {'scorer':>13} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for size in sizes:
+        catalog = Catalog(synthetic_catalog(size))
+        catalog.columns  # build the arrays outside the timed region
+        loop_times = {"alternatives": 0.0, "fallback": 0.0}
+        numpy_times = dict(loop_times)
+
+        # Literal queries, then the same ones and some fuzzy ones expanded against the catalog keywords
+        queries = [(params, compile_query(params)) for params in sample_queries(catalog.books)]
+        queries += [(params, catalog.compile_query(params))
+                    for params in sample_queries(catalog.books) + FUZZY_QUERIES]
+        for params, query in queries:
+            total = fallback_total(query)
+
+            loop_time, expected = _timed(lambda: rank(
+                catalog.records, lambda r: alternative_score(r, query), 5,
+                upper_bound=alternative_upper_bound(query)).results(), 1)
+            numpy_time, got = _timed(lambda: rank_alternatives(catalog, query, 5).results, 3)
+            assert got == expected, f"vectorized alternatives differ for {params}"
+            loop_times["alternatives"] += loop_time
+            numpy_times["alternatives"] += numpy_time
+
+            loop_time, expected = _timed(lambda: rank(
+                catalog.records, lambda r: fallback_score(r, query, total), 10).results(), 1)
+            numpy_time, got = _timed(lambda: rank_fallback(catalog, query, 10).results, 3)
+            assert got == expected, f"vectorized fallback differs for {params}"
+            loop_times["fallback"] += loop_time
+            numpy_times["fallback"] += numpy_time
+
+        for scorer in loop_times:
+            print(f"{size:>10} {scorer:>13} {loop_times[scorer] * 1000:>10.1f} "
+                  f"{numpy_times[scorer] * 1000:>10.2f} {loop_times[scorer] / numpy_times[scorer]:>7.0f}x")
+
+
+def bench_pool(thread_counts, queries_per_thread=200):
+    """Engine built per query against engines borrowed from a warm EnginePool"""
+    catalog = Catalog(knowledge_base)
+    catalog.columns
+    mix = [dict(params, keywords=set(params.get("keywords") or ())) for params in sample_queries(
+        [dict(book) for book in knowledge_base])]
+    print(f"{'threads':>8} {'cold q/s':>10} {'pooled q/s':>11} {'cold ms/q':>10} {'pooled ms/q':>12}")
+    for threads in thread_counts:
+        pool = EnginePool(catalog, size=threads)
+        total = threads * queries_per_thread
+        params = [mix[i % len(mix)] for i in range(total)]
+        rates = {}
+        for label, run in (("cold", lambda p: recommend(p, catalog)),
+                           ("pooled", lambda p: recommend(p, pool=pool))):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(threads) as executor:
+                list(executor.map(run, params))
+            rates[label] = total / (time.perf_counter() - start)
+        print(f"{threads:>8} {rates['cold']:>10.0f} {rates['pooled']:>11.0f} "
+              f"{threads * 1000 / rates['cold']:>10.2f} {threads * 1000 / rates['pooled']:>12.2f}")
+
+
+def write_catalog_file(books, path):
+    """Write synthetic books as CSV or JSONL, depending on the extension"""
+    fields = ("title", "category", "author", "keywords", "rating", "target_audience", "language", "book_type")
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        if path.endswith(".csv"):
+            writer = csv.DictWriter(handle, fieldnames=fields)
+            writer.writeheader()
+            for book in books:
+                writer.writerow(dict(book, keywords=";".join(sorted(book["keywords"]))))
+        else:
+            for book in books:
+                handle.write(json.dumps(dict(book, keywords=sorted(book["keywords"]))) + "\n")
+
+
+def bench_load(sizes):
+    """Streaming load of CSV/JSONL files, each in a fresh process so peak RSS is its own"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            books = synthetic_catalog(size)
+            for ext in ("csv", "jsonl"):
+                path = os.path.join(tmp, f"books_{size}.{ext}")
+                write_catalog_file(books, path)
+                output = subprocess.run([sys.executable, "loader.py", path], capture_output=True, text=True,
+                                        cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+                print(output.stdout.strip())
+            del books
+
+
+# Run in a fresh interpreter: open a catalog, answer one query, report start-up and memory.
+# PSS splits shared (e.g. memory-mapped) pages between the processes using them.
+_COLD_START_PROBE = """
+import sys, time
+start = time.perf_counter()
+if sys.argv[1] == "facts":
+    from catalog import get_catalog
+    catalog = get_catalog()
+else:
+    from loader import load_catalog
+    catalog = load_catalog(sys.argv[1])[0]
+from recommender import recommend
+recommend({"category": "Technology", "keywords": {"ai"}, "rating": 4.5}, catalog)
+elapsed = time.perf_counter() - start
+memory = {}
+for name in ("/proc/self/status", "/proc/self/smaps_rollup"):
+    try:
+        with open(name) as handle:
+            for line in handle:
+                key, _, value = line.partition(":")
+                memory[key] = int(value.split()[0]) / 1024 if value.strip().endswith("kB") else None
+    except OSError:
+        pass
+if len(sys.argv) > 2:
+    sys.stdin.readline()  # hold the mapping until every sibling has been measured
+print(f"{elapsed * 1000:.0f} {memory.get('VmRSS') or 0:.1f} {memory.get('Pss') or 0:.1f}")
+"""
+
+
+def _cold_start(source, processes=1):
+    """Start `processes` probes on one catalog at once; returns [(ms, rss MB, pss MB)]"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    args = [sys.executable, "-c", _COLD_START_PROBE, source] + (["hold"] if processes > 1 else [])
+    probes = [subprocess.Popen(args, cwd=cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+              for _ in range(processes)]
+    # Measure while all of them are alive, then let them go
+    outputs = [probe.communicate("\n")[0] for probe in probes]
+    # A probe that died (e.g. out of memory) prints nothing and is left out
+    return [tuple(float(x) for x in output.split()) for output in outputs if output.strip()]
+
+
+def bench_snapshot(sizes, processes=4):
+    """Cold start and per-process memory: facts.py, a JSONL catalog, and its mmap snapshot"""
+    from snapshot import write_snapshot
+    ms, rss, pss = _cold_start("facts")[0]
+    print(f"facts.py ({len(knowledge_base)} books): {ms:.0f}ms to first result, RSS {rss:.1f} MB")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            books = synthetic_catalog(size)
+            jsonl, snap = os.path.join(tmp, f"books_{size}.jsonl"), os.path.join(tmp, f"books_{size}.snap")
+            write_catalog_file(books, jsonl)
+            write_snapshot(Catalog(books), snap)
+            del books
+            print(f"{size:>10,} books (snapshot {os.path.getsize(snap) / (1024 * 1024):.0f} MB)")
+            for label, path in (("jsonl", jsonl), ("snapshot", snap)):
+                ms, rss, pss = _cold_start(path)[0]
+                shared = _cold_start(path, processes)
+                pss = f"{sum(p for _, _, p in shared) / len(shared):7.1f} MB" if shared else "failed"
+                print(f"    {label:<9} {ms:8.0f}ms to first result, RSS {rss:7.1f} MB; "
+                      f"{len(shared)}/{processes} processes: mean PSS {pss}")
+
+
+def bench_dedupe(sizes, duplicate_share=0.2):
+    """Merge pass over catalogs where a share of the books are re-listed copies"""
+    print(f"{'books':>10} {'merged':>9} {'compile s':>10} {'dedupe s':>9} {'us/book':>8}")
+    for size in sizes:
+        originals = synthetic_catalog(int(size * (1 - duplicate_share)))
+        rng = random.Random(1)
+        copies = [dict(book, title=f" {book['title'].upper()} ", rating=round(rng.uniform(3.0, 5.0), 1))
+                  for book in rng.choices(originals, k=size - len(originals))]
+        books = originals + copies
+        rng.shuffle(books)
+        compile_time, records = _timed(lambda: [compile_book(book) for book in books], 1)
+        dedupe_time, (canonical, merged) = _timed(lambda: dedupe_records(records), 1)
+        assert len(canonical) == len(originals) and merged == len(copies)
+        print(f"{size:>10} {merged:>9} {compile_time:>10.2f} {dedupe_time:>9.2f} {dedupe_time / size * 1e6:>8.2f}")
+        del books, records, canonical
+
+
+def random_events(catalog, count, seed=0):
+    """A mix of add / merge / update / remove events against a deduplicated catalog"""
+    rng = random.Random(seed)
+    fresh = iter(synthetic_catalog(len(catalog.books) + count, seed=seed + 1)[len(catalog.books):])
+    events = []
+    live = [book for book in catalog.books if book is not None]
+    for _ in range(count):
+        position = rng.randrange(len(live))
+        book = live[position]
+        operation = rng.choice(("add", "merge", "update", "update", "remove"))
+        if operation == "add":
+            book = next(fresh)
+            live.append(book)
+        elif operation == "merge":
+            operation, book = "add", dict(book, keywords={"sequel"}, rating=round(rng.uniform(1, 5), 1))
+        elif operation == "update":
+            book = dict(book, rating=round(rng.uniform(1, 5), 1), category=rng.choice(("AI", "Fiction", "Poetry")),
+                        keywords=set(rng.sample(sorted(set(book["keywords"]) | {"classic", "new"}), 2)))
+            live[position] = book
+        else:
+            live.pop(position)
+        events.append((operation, book))
+    return events
+
+
+def bench_updates(sizes, events_per_size=2000, batch=50):
+    """Incremental apply() against a full rebuild, checking that both answer every query alike"""
+    print(f"{'books':>10} {'events':>7} {'us/event':>9} {'rebuild s':>10}")
+    for size in sizes:
+        catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+        catalog.columns  # patch the arrays too, not just the indexes
+        catalog.apply([])  # builds the title/author key map once, outside the timed region
+        events = random_events(catalog, events_per_size)
+        start = time.perf_counter()
+        for i in range(0, len(events), batch):
+            catalog.apply(events[i:i + batch])
+        update_time = (time.perf_counter() - start) / len(events)
+
+        rebuild_time, rebuilt = _timed(lambda: Catalog([b for b in catalog.books if b is not None],
+                                                       rating_policy="max"), 1)
+        assert len(catalog) == len(rebuilt)
+        touched = [book for _, book in events[-20:]]
+        for params in sample_queries(rebuilt.books) + [
+                {"author": b.get("author"), "keywords": b.get("keywords"), "rating": b.get("rating")} for b in touched]:
+            query = compile_query(params)
+            for index, rebuilt_index in ((catalog.index, rebuilt.index), (catalog.columns, rebuilt.columns)):
+                got = [catalog.records[i] for i in index.exact_candidates(query)]
+                assert got == [rebuilt.records[i] for i in rebuilt_index.exact_candidates(query)], params
+            assert rank_alternatives(catalog, query, 5).results == rank_alternatives(rebuilt, query, 5).results
+            assert rank_fallback(catalog, query, 10).results == rank_fallback(rebuilt, query, 10).results
+            got, expected = recommend(params, catalog), recommend(params, rebuilt)
+            assert (got.tier, got.items) == (expected.tier, expected.items), params
+        print(f"{size:>10} {len(events):>7} {update_time * 1e6:>9.1f} {rebuild_time:>10.2f}")
+
+
+def bench_rete(sizes, repeat=3):
+    """The index engine against the Rete-native one: build time, memory and per-query latency"""
+    print(f"{'books':>10} {'engine':>7} {'build s':>8} {'memory MB':>10} {'ms/query':>9}")
+    for size in sizes:
+        catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+        catalog.columns
+        queries = sample_queries(catalog.books) + FUZZY_QUERIES + [{"category": "Fiction", "author": "Nobody"}]
+        results = {}
+        for mode in ("index", "rete"):
+            tracemalloc.start()
+            start = time.perf_counter()
+            pool = EnginePool(catalog, size=1, mode=mode)
+            with pool.engine() as engine:
+                engine.reset()  # the Rete engine declares the catalog here
+            build_time = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+            tracemalloc.stop()
+            query_time, results[mode] = _timed(lambda: [recommend(params, pool=pool) for params in queries], repeat)
+            print(f"{size:>10} {mode:>7} {build_time:>8.2f} {memory:>10.1f} "
+                  f"{query_time / len(queries) * 1000:>9.2f}")
+            del pool
+        for got, expected in zip(results["rete"], results["index"]):
+            assert (got.tier, got.items) == (expected.tier, expected.items), "Rete engine differs from index engine"
+
+
+def synthetic_vocabulary(size, seed=0):
+    """`size` distinct multi-word keywords, from a few thousand made-up words"""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = sorted({"".join(rng.choice(letters) for _ in range(rng.randint(3, 9))) for _ in range(5000)})
+    vocabulary = set()
+    while len(vocabulary) < size:
+        vocabulary.add(" ".join(rng.sample(words, rng.randint(1, 3))))
+    return sorted(vocabulary)
+
+
+def _typo(word, rng):
+    position = rng.randrange(len(word))
+    return word[:position] + word[position + 1:]
+
+
+def bench_keywords(sizes, lookups=2000):
+    """Fuzzy keyword lookups (typos, prefixes, acronyms, hyphen variants) against vocabulary size"""
+    print(f"{'keywords':>10} {'build s':>8} {'memory MB':>10} {'kind':>8} {'us/lookup':>10} {'found':>6}")
+    for size in sizes:
+        vocabulary = synthetic_vocabulary(size)
+        build_time, index = _timed(lambda: KeywordIndex(vocabulary), 1)
+        tracemalloc.start()  # a second, traced build: tracing slows the build down several times
+        traced = KeywordIndex(vocabulary)
+        memory = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+        tracemalloc.stop()
+        del traced
+
+        rng = random.Random(1)
+        targets = rng.sample(vocabulary, min(lookups, size))
+        probes = {
+            "typo": [(_typo(kw, rng), kw) for kw in targets],
+            "prefix": [(kw[:max(3, len(kw) // 2)], kw) for kw in targets],
+            "acronym": [("".join(word[0] for word in kw.split()).upper(), kw) for kw in targets if " " in kw],
+            "hyphen": [(kw.replace(" ", "-").title(), kw) for kw in targets],
+        }
+        for kind, pairs in probes.items():
+            start = time.perf_counter()
+            found = sum(any(match == kw for match, _ in index.lookup(probe)) for probe, kw in pairs)
+            lookup_time = (time.perf_counter() - start) / len(pairs)
+            print(f"{size:>10} {build_time:>8.2f} {memory:>10.1f} {kind:>8} "
+                  f"{lookup_time * 1e6:>10.1f} {found / len(pairs):>6.0%}")
+        assert all(index.lookup(probe)[0] == (kw, 1.0) for probe, kw in probes["hyphen"]), \
+            "hyphenated / capitalized keywords must match exactly"
+
+
+def sequential_tiers(catalog, query):
+    """The tiers below exact the way they used to be found: one ranking per tier"""
+    columns = catalog.columns
+    if columns is None:
+        partial = list(islice((record for record in catalog.live_records() if partial_match(record, query)), 10))
+    else:
+        related = columns.field_matches("category", query.category) | columns.field_matches("author", query.author)
+        partial = [catalog.records[i] for i in related.nonzero()[0][:10].tolist()]
+    return rank_alternatives(catalog, query, 5).results, rank_fallback(catalog, query, 10).results, partial
+
+
+def bench_tiers(sizes):
+    """Separate alternatives / fallback / partial passes against score_tiers' single pass"""
+    print(f"{'books':>10} {'path':>6} {'separate ms':>12} {'single ms':>10} {'speedup':>8}")
+    # Queries that reach every tier: related-only, rating-0 fallback, and nothing at all
+    fallthrough = [{"category": "Fiction", "author": "Nobody"}, {"rating": 0.0}, {"author": "Nobody", "keywords": {"zzz"}}]
+    for size in sizes:
+        catalog = Catalog(synthetic_catalog(size))
+        catalog.columns
+        queries = [catalog.compile_query(params)
+                   for params in sample_queries(catalog.books) + FUZZY_QUERIES + fallthrough]
+        for path in ("numpy", "loop"):
+            if path == "loop":
+                catalog._columns = False  # what a catalog without NumPy does
+            separate = single = 0.0
+            for query in queries:
+                separate_time, expected = _timed(lambda: sequential_tiers(catalog, query), 1)
+                single_time, tiers = _timed(lambda: score_tiers(catalog, query, 5, 10, 10), 1)
+                got = (tiers.alternatives.results, tiers.fallback.results, tiers.partial)
+                assert got == expected, f"single-pass tiers differ for {query}"
+                separate += separate_time
+                single += single_time
+            print(f"{size:>10} {path:>6} {separate * 1000:>12.1f} {single * 1000:>10.1f} {separate / single:>7.1f}x")
+
+
+def bench_pages(sizes):
+    """A query matching most of the catalog: first page against converting every match"""
+    print(f"{'books':>10} {'matches':>9} {'query ms':>9} {'page ms':>8} {'all ms':>8} {'page MB':>8} {'all MB':>7}")
+    for size in sizes:
+        catalog = Catalog(synthetic_catalog(size))
+        pool = EnginePool(catalog, size=1)
+        params = {"language": "English"}
+        query_time, result = _timed(lambda: recommend(params, pool=pool), 1)
+
+        tracemalloc.start()
+        page_time, page = _timed(lambda: result.page(), 1)
+        page_memory = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        tracemalloc.start()
+        all_time, everything = _timed(lambda: list(result.items), 1)
+        all_memory = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+        assert result.tier == "exact" and page.items == everything[:len(page.items)]
+        assert result.page(page.cursor).items == everything[page.cursor:page.cursor + len(page.items)]
+        print(f"{size:>10} {page.total:>9} {query_time * 1000:>9.1f} {page_time * 1000:>8.2f} "
+              f"{all_time * 1000:>8.1f} {page_memory:>8.2f} {all_memory:>7.1f}")
+
+
+class DeltaRecorder:
+    """Stands in for the streamlit module and counts the elements a render
+    sends; each one is a delta message to the browser"""
+
+    def __init__(self):
+        self.deltas = 0
+
+    def _element(self, *args, **kwargs):
+        self.deltas += 1
+        return self
+
+    write = markdown = info = _element
+
+    def columns(self, spec):
+        self.deltas += 1
+        return [self] * (spec if isinstance(spec, int) else len(spec))
+
+    def expander(self, label):
+        self.deltas += 1
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def bench_render(page_sizes, repeat=20):
+    """Delta messages and render time of a page of results, per-book widgets against one markdown block"""
+    print(f"{'page':>6} {'mode':>9} {'deltas':>7} {'ms/page':>8}")
+    catalog = Catalog(synthetic_catalog(max(page_sizes) * 10))
+    params = {"category": "Technology", "keywords": {"ai", "python"}, "rating": 4.5}
+    result = recommend({"language": "English"}, catalog=catalog)
+    query = catalog.compile_query(params)
+    for size in page_sizes:
+        page = result.page(0, size)
+        for mode in ("detailed", "compact"):
+            recorder = DeltaRecorder()
+            render_page(recorder, page, query, mode=mode)
+            render_time, _ = _timed(lambda: render_page(DeltaRecorder(), page, query, mode=mode), repeat)
+            print(f"{size:>6} {mode:>9} {recorder.deltas:>7} {render_time * 1000:>8.2f}")
+
+
+def bench_reruns(sizes, reruns=50):
+    """Streamlit reruns at the last step: shared cache only against the per-session memo"""
+    print(f"{'books':>10} {'path':>8} {'us/rerun':>9} {'engine runs':>12} {'memo hits':>10}")
+    params = {"category": "Technology", "keywords": {"ML", "pyth"}, "language": "English", "rating": 4.5}
+    for size in sizes:
+        catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+        pool = EnginePool(catalog, size=1)
+
+        def rerun_cached(cache):
+            # What every rerun used to do: cache lookup, query compile and page rendering
+            result = cached_recommend(params, cache, pool=pool)
+            return page_markdown(result.page(), catalog.compile_query(params))
+
+        memo = SessionMemo()
+
+        def rerun_memo(cache):
+            result = memo.recommend(params, cache, pool=pool)
+            page = memo.remember(("page", 10), result.page)
+            query = memo.remember("query", lambda: catalog.compile_query(params))
+            return memo.remember(("markdown", 10), lambda: page_markdown(page, query))
+
+        outputs = {}
+        for path, rerun in (("cache", rerun_cached), ("memo", rerun_memo)):
+            cache = ResultCache()
+            rerun_time, outputs[path] = _timed(lambda: rerun(cache), reruns)
+            print(f"{size:>10} {path:>8} {rerun_time * 1e6:>9.1f} {cache.stats()['misses']:>12} "
+                  f"{memo.hits if path == 'memo' else '-':>10}")
+        assert outputs["memo"] == outputs["cache"], "memoized rerun renders something else"
+        assert memo.stats() == {"hits": reruns - 1, "misses": 1, "hit_rate": (reruns - 1) / reruns}
+        # A catalog update must reach the session on its next rerun
+        catalog.apply([("remove", catalog.books[0])])
+        memo.recommend(params, ResultCache(), pool=pool)
+        assert memo.misses == 2, "memo survived a catalog update"
+
+
+def _start_service(service):
+    """Run `service` on an ephemeral port in a background thread; returns (host, port)"""
+    started = threading.Event()
+    address = []
+
+    def ready(bound):
+        address.extend(bound[:2])
+        started.set()
+
+    threading.Thread(target=lambda: asyncio.run(serve(service, port=0, ready=ready)), daemon=True).start()
+    started.wait()
+    return tuple(address)
+
+
+async def _http_client(host, port, bodies, latencies, statuses):
+    """One keep-alive connection posting `bodies` to /recommend one after another"""
+    reader, writer = await asyncio.open_connection(host, port)
+    for body in bodies:
+        start = time.perf_counter()
+        writer.write(f"POST /recommend HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+        json.loads(await reader.readexactly(length))
+        latencies.append(time.perf_counter() - start)
+        statuses.append(int(head.split(b" ", 2)[1]))
+    writer.close()
+
+
+def load_test(host, port, profiles, clients, requests_per_client):
+    """Drive the service with `clients` concurrent connections; returns (latencies, statuses, seconds)"""
+    rng = random.Random(0)
+    latencies, statuses = [], []
+    bodies = [[json.dumps(rng.choice(profiles)).encode("utf-8") for _ in range(requests_per_client)]
+              for _ in range(clients)]
+
+    async def run():
+        await asyncio.gather(*(_http_client(host, port, client_bodies, latencies, statuses)
+                               for client_bodies in bodies))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return latencies, statuses, time.perf_counter() - start
+
+
+def _percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def bench_service(client_counts, size=100_000, requests_per_client=200, workers=4):
+    """Load-test the HTTP service: p50/p99 latency and requests per second per client count"""
+    catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+    catalog.columns
+    profiles = [dict(params, keywords=sorted(params.get("keywords", ())))
+                for params in sample_queries(catalog.books) + FUZZY_QUERIES]
+    # Mostly distinct queries, so the cache and coalescing don't hide the scoring cost
+    rng = random.Random(1)
+    profiles += [{"category": book["category"], "author": book["author"], "rating": round(rng.uniform(3, 5), 1)}
+                 for book in rng.sample(catalog.books, 500)]
+    print(f"{size} books, {workers} workers")
+    print(f"{'clients':>8} {'requests':>9} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'coalesced':>10} {'cached':>7}")
+    for clients in client_counts:
+        service = RecommendationService(catalog, workers=workers, cache_size=0)
+        host, port = _start_service(service)
+        latencies, statuses, elapsed = load_test(host, port, profiles, clients, requests_per_client)
+        assert set(statuses) == {200}, f"unexpected statuses {set(statuses)}"
+        stats = service.stats()
+        print(f"{clients:>8} {len(latencies):>9} {_percentile(latencies, 0.5) * 1000:>8.1f} "
+              f"{_percentile(latencies, 0.99) * 1000:>8.1f} {len(latencies) / elapsed:>8.0f} "
+              f"{stats['coalesced']:>10} {stats['cache']['hits']:>7}")
+
+
+def bench_metrics(sizes, rounds=5):
+    """What recording per-stage metrics adds to a query"""
+    print(f"{'books':>10} {'queries':>8} {'ms/query':>9} {'record us':>10} {'overhead':>9}")
+    enabled = metrics.enabled
+    try:
+        for size in sizes:
+            catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+            catalog.columns
+            pool = EnginePool(catalog, size=1)
+            queries = sample_queries(catalog.books) + FUZZY_QUERIES
+            metrics.enabled = False
+            [recommend(params, pool=pool) for params in queries]  # warm the keyword index
+            metrics.enabled = True
+            metrics.reset()
+            query_time, results = _timed(lambda: [recommend(params, pool=pool) for params in queries], rounds)
+            query_time /= len(queries)
+            assert metrics.queries == rounds * len(queries)
+            assert f"library_queries_total {metrics.queries}" in metrics.prometheus_text()
+            # Recording is the only work metrics add; the stage timers run either way
+            record_time, _ = _timed(lambda: [metrics.observe_result(result) for result in results], 200)
+            record_time /= len(results)
+            print(f"{size:>10} {rounds * len(queries):>8} {query_time * 1000:>9.2f} {record_time * 1e6:>10.1f} "
+                  f"{record_time / query_time * 100:>8.2f}%")
+    finally:
+        metrics.enabled = enabled
+        metrics.reset()
+
+
+def _traced_build(build):
+    """(result of build(), MB it allocated and still holds)"""
+    tracemalloc.start()
+    result = build()
+    memory = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+    tracemalloc.stop()
+    return result, memory
+
+
+def bench_books(sizes, checked=1000):
+    """Catalog books as experta BookFacts vs slotted Books: memory per book and dict conversion"""
+    print(f"{'books':>10} {'record':>9} {'MB':>8} {'bytes/book':>11} {'convert s':>10} {'us/book':>8}")
+    for size in sizes:
+        source = synthetic_catalog(size)
+        converted = {}
+        for label, make in (("BookFact", BookFact), ("Book", Book)):
+            books, memory = _traced_build(lambda: [make(**book) for book in source])
+
+            def convert_all():
+                # Converted dicts are dropped as they go, so neither run pays for the other's garbage
+                for book in books:
+                    converFact_to_string(book)
+
+            convert_time, _ = _timed(convert_all, 3)
+            converted[label] = [converFact_to_string(book) for book in books[:checked]]
+            print(f"{size:>10} {label:>9} {memory:>8.1f} {memory * 1024 * 1024 / size:>11.0f} "
+                  f"{convert_time:>10.2f} {convert_time / size * 1e6:>8.2f}")
+            del books
+        for old, new in zip(converted["BookFact"], converted["Book"]):
+            assert dict(old, keywords=sorted(old["keywords"])) == dict(new, keywords=sorted(new["keywords"])), \
+                "Book converts differently from BookFact"
+        del source
+
+
+def rebuilt_payload(result, cursor, size):
+    """The page as JSON with every book dict rebuilt and encoded, as before payloads were kept"""
+    page = result.page(cursor, size)
+    books = [{"title": b.title, "category": b.category, "author": b.author, "rating": float(b.rating),
+              "target_audience": b.target_audience, "language": b.language, "book_type": b.book_type,
+              "keywords": list(b.keywords)} for b in (record.book for record in page.records)]
+    scores = [item[1] if isinstance(item, tuple) else None for item in page.items]
+    return json.dumps({"tier": result.tier, "message": result.message, "cursor": page.cursor, "total": page.total,
+                       "recommendations": [{"book": book, "score": score} for book, score in zip(books, scores)]},
+                      ensure_ascii=False).encode("utf-8")
+
+
+def bench_payloads(page_sizes, size=100_000, repeat=200):
+    """Assembling a result page for the API: books rebuilt and encoded per request vs precomputed payloads"""
+    catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+    pool = EnginePool(catalog, size=1)
+    results = [recommend(params, pool=pool) for params in sample_queries(catalog.books) + FUZZY_QUERIES]
+    results = [result for result in results if result.records]
+    print(f"{size} books, {len(results)} queries")
+    print(f"{'page':>6} {'rebuild us':>11} {'as_dict us':>11} {'as_json us':>11} {'speedup':>8} {'KB/page':>8}")
+    for page_size in page_sizes:
+        for result in results:
+            expected = json.loads(rebuilt_payload(result, 0, page_size))
+            assert json.loads(result.as_json(0, page_size)) == expected, "as_json differs from a rebuilt page"
+            assert json.loads(json.dumps(result.as_dict(0, page_size))) == expected
+        timings = {}
+        for label, assemble in (("rebuild", lambda r: rebuilt_payload(r, 0, page_size)),
+                                ("as_dict", lambda r: json.dumps(r.as_dict(0, page_size), ensure_ascii=False)),
+                                ("as_json", lambda r: r.as_json(0, page_size))):
+            seconds, _ = _timed(lambda: [assemble(result) for result in results], repeat)
+            timings[label] = seconds / len(results)
+        page_bytes = sum(len(result.as_json(0, page_size)) for result in results) / len(results)
+        print(f"{page_size:>6} {timings['rebuild'] * 1e6:>11.1f} {timings['as_dict'] * 1e6:>11.1f} "
+              f"{timings['as_json'] * 1e6:>11.1f} {timings['rebuild'] / timings['as_json']:>7.1f}x "
+              f"{page_bytes / 1024:>8.1f}")
+    books = catalog.books[:10_000]
+    _, memory = _traced_build(lambda: [book.json() for book in books])
+    print(f"Cached display + JSON payload: {memory * 1024 * 1024 / len(books):.0f} bytes per book shown")
+
+
+def compared_explanation(record, query, query_keywords):
+    """The explanation of one result by comparing it with the query again, as before matches were recorded"""
+    book = record.book
+    reasons = []
+    if query.category and record.category == query.category:
+        reasons.append(f"it matches your preferred **{book_value(book, 'category')}** category")
+    if query.author and record.author == query.author:
+        reasons.append(f"it's written by your preferred author **{book_value(book, 'author')}**")
+    common_keywords = record.keywords & query_keywords
+    if common_keywords:
+        reasons.append(f"it covers topics you're interested in: {', '.join([f'**{kw}**' for kw in common_keywords])}")
+    if query.target_audience and record.target_audience == query.target_audience:
+        reasons.append(f"it's perfect for **{book_value(book, 'target_audience')}** audience")
+    if query.language and record.language == query.language:
+        reasons.append(f"it's available in your preferred **{book_value(book, 'language')}** language")
+    if query.book_type and record.book_type == query.book_type:
+        reasons.append(f"it's the **{book_value(book, 'book_type')}** format you wanted")
+    title = book_value(book, 'title', 'Unknown Title')
+    if not reasons:
+        return f"**{title}** is recommended based on your overall preferences."
+    if len(reasons) == 1:
+        return f"**{title}** is recommended because {reasons[0]}."
+    if len(reasons) == 2:
+        return f"**{title}** is recommended because {reasons[0]} and {reasons[1]}."
+    return f"**{title}** is recommended because {', '.join(reasons[:-1])}, and {reasons[-1]}."
+
+
+def bench_explain(keyword_counts, size=100_000, repeat=50):
+    """Explaining a page of results: comparing each book with the query again vs the Match its scorer recorded"""
+    catalog = Catalog(synthetic_catalog(size), rating_policy="max")
+    pool = EnginePool(catalog, size=1)
+    vocabulary = sorted({kw for record in catalog.records for kw in record.keywords})
+    rng = random.Random(0)
+    print(f"{size} books, {len(vocabulary)} keywords")
+    print(f"{'keywords':>9} {'tiers':>28} {'compare us':>11} {'match us':>9} {'speedup':>8}")
+    for count in keyword_counts:
+        mix = [dict(params, keywords=set(rng.sample(vocabulary, min(count, len(vocabulary)))))
+               for params in QUERY_MIX + sample_queries(catalog.books) + FUZZY_QUERIES]
+        pages = []
+        for params in mix:
+            result = recommend(params, pool=pool)
+            page = result.page()
+            query = catalog.compile_query(params)
+            if not page.records:
+                continue
+            expected = [compared_explanation(record, query, expanded_keywords(query)) for record in page.records]
+            assert [explain_match(record.book, match) for record, match in zip(page.records, page.matches)] == expected, \
+                f"recorded matches explain {result.tier} results differently"
+            assert explain_recommendations(page.records, query) == expected
+            pages.append((result.tier, page, query))
+
+        def compare():
+            for _, page, query in pages:
+                query_keywords = expanded_keywords(query)
+                [compared_explanation(record, query, query_keywords) for record in page.records]
+
+        def recorded():
+            for _, page, _ in pages:
+                [explain_match(record.book, match) for record, match in zip(page.records, page.matches)]
+
+        results = sum(len(page.records) for _, page, _ in pages)
+        compare_time, _ = _timed(compare, repeat)
+        match_time, _ = _timed(recorded, repeat)
+        tiers = ",".join(sorted({tier for tier, _, _ in pages}))
+        print(f"{count:>9} {tiers:>28} {compare_time / results * 1e6:>11.2f} {match_time / results * 1e6:>9.2f} "
+              f"{compare_time / match_time:>7.1f}x")
+
+
+_SUITE_PROBE = """
+import json, resource, sys, time
+from catalog import Catalog
+from recommender import EnginePool, recommend
+from synthetic import QUERY_MIX, synthetic_books
+size, seconds = int(sys.argv[1]), float(sys.argv[2])
+start = time.perf_counter()
+catalog = Catalog(list(synthetic_books(size)), rating_policy="max")
+pool = EnginePool(catalog, size=1)
+for params in QUERY_MIX:  # warm-up: builds the lazy indexes and columns
+    recommend(params, pool=pool).page()
+build = time.perf_counter() - start
+latencies = []
+start = time.perf_counter()
+while time.perf_counter() - start < seconds or len(latencies) < 2 * len(QUERY_MIX):
+    for params in QUERY_MIX:
+        query_start = time.perf_counter()
+        recommend(params, pool=pool).page()
+        latencies.append(time.perf_counter() - query_start)
+elapsed = time.perf_counter() - start
+latencies.sort()
+print(json.dumps({"books": len(catalog), "build_s": build, "queries": len(latencies),
+                  "qps": len(latencies) / elapsed,
+                  "p50_ms": latencies[len(latencies) // 2] * 1000,
+                  "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1000,
+                  "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+BASELINES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+# How much worse than its baseline a number may get before it counts as a regression
+REGRESSION_LIMITS = {"qps": 0.25, "p50_ms": 0.25, "p99_ms": 0.35, "peak_mb": 0.15}
+
+
+def _suite_run(size, seconds):
+    """One suite measurement in a fresh process, or None if it died (e.g. out of memory)"""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    probe = subprocess.run([sys.executable, "-c", _SUITE_PROBE, str(size), str(seconds)], cwd=cwd,
+                           stdout=subprocess.PIPE, text=True)
+    return json.loads(probe.stdout) if probe.returncode == 0 and probe.stdout.strip() else None
+
+
+def _regressions(run, baseline):
+    """'metric +x%' for each number of `run` that is worse than `baseline` allows"""
+    found = []
+    for metric, limit in REGRESSION_LIMITS.items():
+        if not baseline.get(metric):
+            continue
+        change = run[metric] / baseline[metric] - 1
+        worse = -change if metric == "qps" else change
+        if worse > limit:
+            found.append(f"{metric} {change:+.0%}")
+    return found
+
+
+def bench_suite(sizes, seconds=2.0, save=False):
+    """Throughput, latency and peak memory of the whole pipeline as the catalog grows"""
+    try:
+        with open(BASELINES_FILE, encoding="utf-8") as handle:
+            baselines = json.load(handle)
+    except FileNotFoundError:
+        baselines = {}
+    print(f"{len(QUERY_MIX)} queries per round, {seconds:.0f}s per size")
+    print(f"{'books':>10} {'build s':>8} {'queries':>8} {'q/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak MB':>8}  "
+          f"baseline")
+    regressions = []
+    for size in sizes:
+        run = _suite_run(size, seconds)
+        if run is None:
+            print(f"{size:>10} failed (out of memory?)")
+            continue
+        baseline = baselines.get(str(size))
+        found = _regressions(run, baseline) if baseline else []
+        regressions += [f"{size}: {item}" for item in found]
+        status = "new" if baseline is None else ("REGRESSION " + ", ".join(found) if found else "ok")
+        print(f"{size:>10} {run['build_s']:>8.1f} {run['queries']:>8} {run['qps']:>8.0f} {run['p50_ms']:>8.2f} "
+              f"{run['p99_ms']:>8.2f} {run['peak_mb']:>8.0f}  {status}")
+        if save:
+            baselines[str(size)] = {metric: round(run[metric], 3) for metric in ("qps", "p50_ms", "p99_ms", "peak_mb")}
+    if save:
+        with open(BASELINES_FILE, "w", encoding="utf-8") as handle:
+            json.dump(dict(sorted(baselines.items(), key=lambda item: int(item[0]))), handle, indent=2)
+            handle.write("\n")
+        print(f"Baselines saved to {os.path.basename(BASELINES_FILE)}")
+    elif regressions:
+        sys.exit(f"{len(regressions)} regression(s): " + "; ".join(regressions))
+
+
+BENCHMARKS = {
+    "exact": (bench_exact, [10_000, 100_000, 1_000_000]),
+    "scoring": (bench_scoring, [10_000, 100_000, 1_000_000]),
+    "pool": (bench_pool, [1, 4, 8]),
+    "load": (bench_load, [100_000, 1_000_000, 3_000_000]),
+    "snapshot": (bench_snapshot, [100_000, 1_000_000]),
+    "dedupe": (bench_dedupe, [100_000, 1_000_000, 3_000_000]),
+    "updates": (bench_updates, [10_000, 100_000, 1_000_000]),
+    "rete": (bench_rete, [1_000, 5_000, 20_000]),
+    "keywords": (bench_keywords, [10_000, 100_000, 1_000_000]),
+    "tiers": (bench_tiers, [10_000, 100_000, 1_000_000]),
+    "pages": (bench_pages, [10_000, 100_000, 1_000_000]),
+    "render": (bench_render, [10, 50, 200]),
+    "reruns": (bench_reruns, [1_000, 100_000]),
+    "service": (bench_service, [1, 8, 32]),
+    "metrics": (bench_metrics, [1_000, 100_000]),
+    "books": (bench_books, [100_000, 1_000_000]),
+    "payloads": (bench_payloads, [10, 50, 200]),
+    "explain": (bench_explain, [1, 10, 100]),
+    "suite": (bench_suite, [1_000, 10_000, 100_000, 1_000_000]),
+}
+
+
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "exact"
+    bench, default_sizes = BENCHMARKS[name]
+    args = sys.argv[2:]
+    options = {arg[2:].replace("-", "_"): True for arg in args if arg.startswith("--")}
+    bench([int(arg) for arg in args if not arg.startswith("--")] or default_sizes, **options)
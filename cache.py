@@ -0,0 +1,167 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from catalog import get_catalog, normalize_kw, normalize_text
+from metrics import metrics
+from recommender import recommend
+
+# Ratings are snapped to this step before they are used, so 4.5 and 4.50 share an entry
+RATING_BUCKET = 0.1
+
+TEXT_FIELDS = ("category", "author", "target_audience", "language", "book_type")
+
+
+def canonical_params(user_params):
+    """Hashable canonical form of the seven user_params fields"""
+    rating = user_params.get("rating")
+    if rating is not None:
+        rating = round(round(float(rating) / RATING_BUCKET) * RATING_BUCKET, 1)
+    return (
+        tuple(normalize_text(user_params.get(field)) for field in TEXT_FIELDS)
+        + (tuple(sorted(kw for kw in normalize_kw(user_params.get("keywords")) if kw)), rating)
+    )
+
+
+def params_from_key(key):
+    """The user_params a cache key stands for; queries run on this exact form"""
+    params = {field: value or None for field, value in zip(TEXT_FIELDS, key)}
+    params["keywords"] = set(key[5])
+    params["rating"] = key[6]
+    return params
+
+
+class ResultCache:
+    """LRU + TTL cache of RecommendationResults.
+
+    Entries remember the catalog version they were computed against and are
+    dropped on lookup once the catalog changes. Cached results are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (catalog version, expires at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_version, expires_at, result = entry
+            if entry_version != version:
+                self.invalidations += 1
+            elif expires_at < self.clock():
+                self.expirations += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, version, result):
+        with self._lock:
+            self._entries[key] = (version, self.clock() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def cached_recommend(user_params, cache, catalog=None, pool=None):
+    """recommend() behind a ResultCache keyed on the canonical user_params"""
+    if pool is not None:
+        catalog = pool.catalog
+    elif catalog is None:
+        catalog = get_catalog()
+    key = canonical_params(user_params)
+    result = cache.get(key, catalog.version)
+    if result is None:
+        result = recommend(params_from_key(key), catalog, pool)
+        # Tagged with the version it actually saw, in case the catalog changed meanwhile
+        cache.put(key, result.catalog_version, result)
+    else:
+        metrics.observe_result(result, cached=True)
+    return result
+
+
+class SessionMemo:
+    """What one Streamlit session last computed, kept across its reruns.
+
+    Streamlit reruns the whole script on every interaction. While the
+    finalized preferences and the catalog version stay the same, a rerun
+    gets this session's result back, along with anything derived from it
+    (the compiled query, rendered pages), without touching the engine or
+    the shared ResultCache.
+    """
+
+    def __init__(self):
+        self.key = None  # (canonical user_params, catalog version)
+        self.result = None
+        self.derived = {}  # name -> value computed from the current result
+        self.hits = 0
+        self.misses = 0
+
+    def recommend(self, user_params, cache, catalog=None, pool=None):
+        """cached_recommend(), skipped entirely while the key is unchanged"""
+        if pool is not None:
+            catalog = pool.catalog
+        elif catalog is None:
+            catalog = get_catalog()
+        key = (canonical_params(user_params), catalog.version)
+        if key == self.key:
+            self.hits += 1
+            return self.result
+        self.misses += 1
+        self.result = cached_recommend(user_params, cache, catalog, pool)
+        self.key = (key[0], self.result.catalog_version)
+        self.derived = {}
+        return self.result
+
+    def remember(self, name, compute):
+        """compute(), once per result"""
+        if name not in self.derived:
+            self.derived[name] = compute()
+        return self.derived[name]
+
+    def clear(self):
+        self.key = self.result = None
+        self.derived = {}
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
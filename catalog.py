@@ -0,0 +1,616 @@
+# catalog.py
+from bisect import bisect_left, bisect_right, insort
+import sys
+import threading
+from collections import namedtuple
+from collections.abc import Mapping
+from contextlib import contextmanager
+from itertools import count
+
+from facts import BOOK_FIELDS, Book, knowledge_base as default_knowledge_base
+
+# Fields that are compared by normalized equality in the rules
+INDEXED_FIELDS = ("category", "author", "target_audience", "language", "book_type")
+
+# Rating window used by exact_match / suggest_alternatives
+RATING_TOLERANCE = 0.5
+# Slack for the bisect range; every candidate is re-checked with abs() afterwards
+_RATING_SLACK = 1e-9
+
+def _mean_rating(ratings):
+    return round(sum(ratings) / len(ratings), 2)
+
+
+# How dedupe_records reconciles the ratings of duplicates; each gets the
+# non-zero (i.e. rated) values in catalog order
+RATING_POLICIES = {
+    "max": max,
+    "min": min,
+    "mean": _mean_rating,
+    "first": lambda ratings: ratings[0],
+    "last": lambda ratings: ratings[-1],
+}
+DEFAULT_RATING_POLICY = "max"
+
+
+def normalize_text(text):
+    """Normalize text fields for comparison"""
+    if not text:
+        return ""
+    return str(text).strip().lower()
+
+
+def normalize_kw(kw_set):
+    """Normalize keywords for comparison"""
+    if not kw_set:
+        return set()
+    return set(str(k).strip().lower() for k in kw_set)
+
+
+def book_value(book, field_name, default=None):
+    """Read a field from a Book, a BookFact or a plain dict"""
+    # BookFact is a dict subclass; its class attributes (title = str, ...) are
+    # type hints, so getattr() would return the type instead of the value.
+    if isinstance(book, Mapping):
+        return book.get(field_name, default)
+    return getattr(book, field_name, default)
+
+
+# One compiled catalog entry: the book for display (a facts.Book) plus its
+# comparison fields, normalized and interned once when the catalog is loaded.
+BookRecord = namedtuple("BookRecord", (
+    "book", "category", "author", "target_audience", "language", "book_type",
+    "keywords", "rating",
+))
+
+# The user's side of a comparison, normalized once per query. Text fields are
+# "" when not given, keywords a frozenset, rating a float or None.
+# keyword_weights is None for exact keyword matching; Catalog.compile_query
+# fills it with, per query keyword, ((catalog keyword, similarity in tenths), ...).
+QueryRecord = namedtuple("QueryRecord", (
+    "category", "author", "target_audience", "language", "book_type",
+    "keywords", "rating", "keyword_weights",
+), defaults=(None,))
+
+# Similarity (in tenths) from which a fuzzy keyword match satisfies exact_match
+STRONG_KEYWORD_MATCH = 8
+
+
+def match_keywords(query):
+    """Catalog keywords that satisfy the query's keyword criterion"""
+    if query.keyword_weights is None:
+        return query.keywords
+    return frozenset(kw for weights in query.keyword_weights for kw, tenths in weights
+                     if tenths >= STRONG_KEYWORD_MATCH)
+
+
+def expanded_keywords(query):
+    """Every catalog keyword the query's keywords matched, close or not"""
+    if query.keyword_weights is None:
+        return query.keywords
+    return {kw for weights in query.keyword_weights for kw, _ in weights}
+
+
+def keyword_tenths(keywords, query):
+    """Keyword credit of a book with these keywords, in tenths of a shared keyword.
+
+    Each query keyword counts its best match among `keywords`: 10 when the
+    book has it, its similarity when it only has a fuzzy match.
+    """
+    if query.keyword_weights is None:
+        return 10 * len(keywords & query.keywords)
+    return sum(max((tenths for kw, tenths in weights if kw in keywords), default=0)
+               for weights in query.keyword_weights)
+
+
+def book_key(book):
+    """Normalized (title, author) a book is identified by for merging and updates"""
+    return normalize_text(book_value(book, "title")), normalize_text(book_value(book, "author"))
+
+
+def _normalized(text):
+    return sys.intern(str(text).strip().lower()) if text else ""
+
+
+def compile_book(book):
+    """Normalize one catalog book (Book, BookFact or dict) into a BookRecord"""
+    book = Book.from_book(book)
+    keywords = frozenset(map(sys.intern, filter(None, (kw.strip().lower() for kw in book.keywords))))
+    return BookRecord(
+        book,
+        _normalized(book.category),
+        _normalized(book.author),
+        _normalized(book.target_audience),
+        _normalized(book.language),
+        _normalized(book.book_type),
+        # Already-normalized keywords share the book's frozenset
+        book.keywords if keywords == book.keywords else keywords,
+        book.rating,
+    )
+
+
+def compile_query(user_params=None, **fields):
+    """Normalize user preferences (a user_params dict and/or keyword args)"""
+    params = dict(user_params or {}, **fields)
+    rating = params.get("rating")
+    return QueryRecord(
+        normalize_text(params.get("category")),
+        normalize_text(params.get("author")),
+        normalize_text(params.get("target_audience")),
+        normalize_text(params.get("language")),
+        normalize_text(params.get("book_type")),
+        frozenset(kw for kw in normalize_kw(params.get("keywords")) if kw),
+        float(rating) if rating is not None else None,
+    )
+
+
+class CatalogIndex:
+    """Inverted indexes over compiled records: one posting set per field value,
+    per keyword and per rating, with the distinct ratings sorted for range
+    lookups. add() and remove() patch single books in place."""
+
+    def __init__(self, records):
+        self.postings = {field: {} for field in INDEXED_FIELDS}
+        self.keyword_postings = {}
+        self.rating_postings = {}
+        self.ratings = []  # by book id; None for a removed book
+        self.live = 0
+
+        for book_id, record in enumerate(records):
+            if record is None:
+                self.ratings.append(None)
+                continue
+            self._post(book_id, record)
+            self.ratings.append(record.rating)
+
+        self.rating_values = sorted(self.rating_postings)
+
+    def __len__(self):
+        return self.live
+
+    def _post(self, book_id, record):
+        for field in INDEXED_FIELDS:
+            self.postings[field].setdefault(getattr(record, field), set()).add(book_id)
+        for kw in record.keywords:
+            self.keyword_postings.setdefault(kw, set()).add(book_id)
+        self.rating_postings.setdefault(record.rating, set()).add(book_id)
+        self.live += 1
+
+    def add(self, book_id, record):
+        """Index one record, under a new id (the next one) or one freed by remove()"""
+        if record.rating not in self.rating_postings:
+            insort(self.rating_values, record.rating)
+        self._post(book_id, record)
+        if book_id == len(self.ratings):
+            self.ratings.append(record.rating)
+        else:
+            self.ratings[book_id] = record.rating
+
+    def remove(self, book_id, record):
+        """Drop one record's postings; `record` must be what was indexed under `book_id`"""
+        for field in INDEXED_FIELDS:
+            postings = self.postings[field]
+            value = getattr(record, field)
+            postings[value].discard(book_id)
+            if not postings[value]:
+                del postings[value]
+        for kw in record.keywords:
+            self.keyword_postings[kw].discard(book_id)
+            if not self.keyword_postings[kw]:
+                del self.keyword_postings[kw]
+        rating = self.ratings[book_id]
+        self.rating_postings[rating].discard(book_id)
+        if not self.rating_postings[rating]:
+            del self.rating_postings[rating]
+            del self.rating_values[bisect_left(self.rating_values, rating)]
+        self.ratings[book_id] = None
+        self.live -= 1
+
+    def rating_match(self, book_id, rating):
+        return abs(self.ratings[book_id] - float(rating)) <= RATING_TOLERANCE
+
+    def exact_candidates(self, query):
+        """Return ids (catalog order) of books matching every criterion of a
+        QueryRecord. Empty criteria match everything, as in exact_match."""
+        candidate_sets = []
+        for field in INDEXED_FIELDS:
+            value = getattr(query, field)
+            if not value:
+                continue
+            posting = self.postings[field].get(value)
+            if not posting:
+                return []
+            candidate_sets.append(posting)
+
+        if query.keywords:
+            # Any shared keyword is enough, so the keyword criterion is a union
+            postings = [self.keyword_postings[kw] for kw in match_keywords(query) if kw in self.keyword_postings]
+            if not postings:
+                return []
+            candidate_sets.append(set().union(*postings) if len(postings) > 1 else postings[0])
+
+        rating = query.rating
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            smallest, others = candidate_sets[0], candidate_sets[1:]
+            matched = [i for i in smallest if all(i in s for s in others)]
+            if rating:
+                matched = [i for i in matched if self.rating_match(i, rating)]
+        elif rating:
+            target = float(rating)
+            lo = bisect_left(self.rating_values, target - RATING_TOLERANCE - _RATING_SLACK)
+            hi = bisect_right(self.rating_values, target + RATING_TOLERANCE + _RATING_SLACK)
+            matched = [i for value in self.rating_values[lo:hi] if abs(value - target) <= RATING_TOLERANCE
+                       for i in self.rating_postings[value]]
+        else:
+            return [i for i, rating in enumerate(self.ratings) if rating is not None]
+
+        matched.sort()
+        return matched
+
+
+def merge_books(books, rating_policy=DEFAULT_RATING_POLICY):
+    """One book dict standing for several copies of the same book.
+
+    The first copy wins for text fields (later copies only fill gaps),
+    keywords are the union (first spelling of each normalized keyword) and
+    the rating is reconciled by `rating_policy`, a RATING_POLICIES name.
+    """
+    merged = {}
+    for field in BOOK_FIELDS:
+        if field in ("keywords", "rating"):
+            continue
+        for book in books:
+            value = book_value(book, field)
+            if value not in (None, ""):
+                merged[field] = value
+                break
+
+    keywords = {}
+    for book in books:
+        for kw in book_value(book, "keywords") or ():
+            keywords.setdefault(normalize_text(kw), kw)
+    merged["keywords"] = {kw for norm, kw in keywords.items() if norm}
+
+    ratings = [float(rating) for rating in (book_value(book, "rating") for book in books) if rating]
+    merged["rating"] = float(RATING_POLICIES[rating_policy](ratings)) if ratings else 0.0
+    return merged
+
+
+def dedupe_records(records, rating_policy=DEFAULT_RATING_POLICY):
+    """Merge records that share a normalized (title, author); returns (records, merged).
+
+    One hash pass: each canonical record keeps the position of the first
+    copy, and only books that actually have duplicates are merged and
+    recompiled. Books without a title are never merged.
+    """
+    if rating_policy not in RATING_POLICIES:
+        raise ValueError(f"unknown rating policy {rating_policy!r}; expected one of {', '.join(RATING_POLICIES)}")
+    first_seen = {}  # (title, author) -> position in `canonical`
+    copies = {}  # position -> records of every copy, only for duplicated books
+    canonical = []
+    for record in records:
+        key = book_key(record.book)
+        title = key[0]
+        position = first_seen.get(key) if title else None
+        if position is None:
+            if title:
+                first_seen[key] = len(canonical)
+            canonical.append(record)
+        else:
+            copies.setdefault(position, [canonical[position]]).append(record)
+
+    for position, group in copies.items():
+        canonical[position] = compile_book(merge_books([record.book for record in group], rating_policy))
+    return canonical, len(records) - len(canonical)
+
+
+# Source of Catalog.version; every compiled catalog gets a new one
+_versions = count(1)
+
+
+class ReadWriteLock:
+    """Many readers or one writer; a waiting writer holds off new readers"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+class Catalog:
+    """A book list compiled once: normalized records plus their indexes.
+
+    `version` changes whenever the compiled content does, so anything derived
+    from a catalog (e.g. cached results) can tell it is stale. With a
+    `rating_policy`, duplicate books are merged first (see dedupe_records)
+    and `books` is the canonical list.
+
+    A deduplicated catalog can also be changed in place with apply() (or
+    add_book / update_book / remove_book). Each change patches the records,
+    indexes and columns for just that book; a removed book leaves None in
+    `books` and `records` so the other ids stay put. Queries run inside
+    reading(), so they see one version from start to finish.
+    """
+
+    # Duplicates folded into canonical records when the catalog was built
+    merged = 0
+
+    def __init__(self, books, records=None, rating_policy=None):
+        self.version = next(_versions)
+        self.rating_policy = rating_policy
+        # Loaders that compile while streaming pass the records in directly
+        records = records if records is not None else [compile_book(book) for book in books]
+        if rating_policy is not None:
+            records, self.merged = dedupe_records(records, rating_policy)
+        # The compiled Books, not the caller's list; the source books can be freed
+        self.books = [record.book for record in records]
+        self.records = records
+        self.index = CatalogIndex(self.records)
+        self._columns = None
+        self._keyword_index = None
+        self._lock = ReadWriteLock()
+        self._keys = None  # book_key -> id, built on the first update
+
+    def __len__(self):
+        return len(self.index)
+
+    def live_records(self):
+        """Records in catalog order, skipping removed books"""
+        return (record for record in self.records if record is not None)
+
+    def select(self, ids):
+        """The records of `ids`, as a sequence a result can keep.
+
+        A list of the compiled records: apply() replaces entries of
+        `records` in place, so a result resolving its ids later could see a
+        newer version than the one it matched.
+        """
+        records = self.records
+        return [records[i] for i in ids]
+
+    def reading(self):
+        """Hold off updates while a query runs"""
+        return self._lock.read()
+
+    @property
+    def columns(self):
+        """Columnar copy of the records for vectorized scoring, or None without NumPy"""
+        if self._columns is None:
+            try:
+                from columnar import ColumnarCatalog
+            except ImportError:
+                self._columns = False
+            else:
+                self._columns = ColumnarCatalog(self.records)
+        return self._columns if self._columns is not False else None
+
+    @property
+    def keyword_index(self):
+        """Fuzzy lookup over the catalog's keywords (keywords.KeywordIndex), or None without NumPy"""
+        if self._keyword_index is None:
+            try:
+                from keywords import KeywordIndex
+            except ImportError:
+                self._keyword_index = False
+            else:
+                self._keyword_index = KeywordIndex(self.keyword_vocabulary())
+        return self._keyword_index if self._keyword_index is not False else None
+
+    def keyword_vocabulary(self):
+        """Distinct normalized keywords the fuzzy index is built over"""
+        return self.index.keyword_postings.keys()
+
+    def compile_query(self, user_params=None, **fields):
+        """compile_query() with the keywords expanded to fuzzy matches in this catalog"""
+        query = compile_query(user_params, **fields)
+        keyword_index = self.keyword_index if query.keywords else None
+        return keyword_index.expand(query) if keyword_index is not None else query
+
+    # --------------------------
+    # Incremental updates
+    # --------------------------
+    def apply(self, events):
+        """Apply ("add" | "update" | "remove", book) events as one new version.
+
+        For "remove" the book only needs its title and author. Returns the
+        ids touched. The whole batch is checked before anything changes, so
+        a bad event leaves the catalog and its version as they were: it
+        raises KeyError for an update/remove of an unknown book and
+        ValueError for an unknown operation, an untitled book or a field
+        that can't be compiled (such as a non-numeric rating).
+        """
+        if self.rating_policy is None:
+            raise ValueError("incremental updates need a deduplicated catalog (pass a rating_policy)")
+        operations = {"add": self._add, "update": self._update, "remove": self._remove}
+        touched = []
+        with self._lock.write():
+            if self._keys is None:
+                self._keys = {book_key(record.book): book_id for book_id, record in enumerate(self.records)
+                              if record is not None}
+            events = self._checked(events, operations)
+            try:
+                for operation, book in events:
+                    touched.append(operations[operation](book))
+            finally:
+                if touched:
+                    self.version = next(_versions)
+        return touched
+
+    def _checked(self, events, operations):
+        """The events as a list, once every one of them is known to apply in order"""
+        events = list(events)
+        added, removed = set(), set()  # keys the batch itself adds or removes before each event
+        for operation, book in events:
+            if operation not in operations:
+                raise ValueError(f"unknown catalog operation {operation!r}")
+            key = self._key_of(book)
+            exists = key in added or (key in self._keys and key not in removed)
+            if operation == "remove":
+                if not exists:
+                    raise KeyError(f"no book {book_value(book, 'title')!r} by {book_value(book, 'author')!r}")
+                added.discard(key)
+                removed.add(key)
+                continue
+            if operation == "update" and not exists:
+                raise KeyError(f"no book {book_value(book, 'title')!r} by {book_value(book, 'author')!r}")
+            try:
+                # What compile_book does first; if this works, so will the event
+                Book.from_book(book)
+            except (AttributeError, TypeError, ValueError) as error:
+                raise ValueError(f"invalid book {book_value(book, 'title')!r}: {error}") from None
+            added.add(key)
+            removed.discard(key)
+        return events
+
+    def add_book(self, book):
+        """Add a book, merging it into an existing copy (see merge_books); returns its id"""
+        return self.apply([("add", book)])[0]
+
+    def update_book(self, book):
+        """Replace the book with the same title and author; returns its id"""
+        return self.apply([("update", book)])[0]
+
+    def remove_book(self, book):
+        """Remove the book with this title and author; returns the id it had"""
+        return self.apply([("remove", book)])[0]
+
+    def _built_columns(self):
+        # Columns not built yet are compiled from the updated records later
+        return self._columns if self._columns is not None and self._columns is not False else None
+
+    def _index_keywords(self, record):
+        if self._keyword_index is not None and self._keyword_index is not False:
+            for kw in record.keywords:
+                self._keyword_index.add(kw)
+
+    def _unindex_keywords(self, record):
+        # Call after self.index.remove(): keywords no book has any more stop
+        # matching, as they would in a rebuilt fuzzy index
+        if self._keyword_index is not None and self._keyword_index is not False:
+            for kw in record.keywords:
+                if kw not in self.index.keyword_postings:
+                    self._keyword_index.discard(kw)
+
+    def _key_of(self, book):
+        key = book_key(book)
+        if not key[0]:
+            raise ValueError("a catalog book needs a title")
+        return key
+
+    def _add(self, book):
+        key = self._key_of(book)
+        book_id = self._keys.get(key)
+        if book_id is not None:
+            return self._replace(book_id, compile_book(merge_books([self.books[book_id], book],
+                                                                    self.rating_policy)))
+        record = compile_book(book)
+        book_id = len(self.records)
+        self.records.append(record)
+        self.books.append(record.book)
+        self.index.add(book_id, record)
+        columns = self._built_columns()
+        if columns is not None:
+            columns.append_row(record)
+        self._index_keywords(record)
+        self._keys[key] = book_id
+        return book_id
+
+    def _update(self, book):
+        key = self._key_of(book)
+        if key not in self._keys:
+            raise KeyError(f"no book {book_value(book, 'title')!r} by {book_value(book, 'author')!r}")
+        return self._replace(self._keys[key], compile_book(book))
+
+    def _replace(self, book_id, record):
+        self.index.remove(book_id, self.records[book_id])
+        self.index.add(book_id, record)
+        columns = self._built_columns()
+        if columns is not None:
+            columns.set_row(book_id, record)
+        self._unindex_keywords(self.records[book_id])
+        self._index_keywords(record)
+        self.records[book_id] = record
+        self.books[book_id] = record.book
+        return book_id
+
+    def _remove(self, book):
+        key = self._key_of(book)
+        book_id = self._keys.pop(key, None)
+        if book_id is None:
+            raise KeyError(f"no book {book_value(book, 'title')!r} by {book_value(book, 'author')!r}")
+        self.index.remove(book_id, self.records[book_id])
+        columns = self._built_columns()
+        if columns is not None:
+            columns.delete_row(book_id)
+        self._unindex_keywords(self.records[book_id])
+        self.records[book_id] = None
+        self.books[book_id] = None
+        return book_id
+
+
+# Compiled catalogs, keyed by id() of the book list and the rating policy;
+# each entry is (book list, its length when compiled, Catalog)
+_catalog_cache = {}
+
+
+def get_catalog(books=None, rating_policy=DEFAULT_RATING_POLICY):
+    """Return the compiled, deduplicated catalog for a book list, compiling it on first use.
+
+    A different list, or one that grew or shrank, is recompiled. Edits that
+    keep the length (books[i] = ..., or changing a book dict) can't be seen
+    from here: follow them with invalidate_catalog(books).
+    """
+    if books is None:
+        books = default_knowledge_base
+    key = (id(books), rating_policy)
+    cached = _catalog_cache.get(key)
+    # Recompile if the list was replaced or grew/shrank since it was compiled
+    if cached is None or cached[0] is not books or cached[1] != len(books):
+        cached = (books, len(books), Catalog(books, rating_policy=rating_policy))
+        _catalog_cache[key] = cached
+    return cached[2]
+
+
+def invalidate_catalog(books=None):
+    """Forget the compiled catalogs of a book list after it was edited in place.
+
+    The next get_catalog(books) compiles it again under a new version, so
+    results cached against the old one are dropped. Anything that holds the
+    old Catalog itself (an EnginePool, the HTTP service) keeps serving it;
+    change those with Catalog.apply() instead.
+    """
+    if books is None:
+        books = default_knowledge_base
+    for key in [key for key, (cached_books, _, _) in _catalog_cache.items() if cached_books is books]:
+        del _catalog_cache[key]
@@ -0,0 +1,297 @@
+# columnar.py
+import numpy as np
+
+from catalog import INDEXED_FIELDS, RATING_TOLERANCE, match_keywords
+from scoring import FALLBACK_CLOSE_RATING, FIELD_BITS, RATING_BIT
+
+# Code used for a query value that no book has; never equal to a real code
+_MISSING = -1
+# Code of every field of a removed row; equal to no query code, not even _MISSING
+_REMOVED = -2
+
+# Rows whose keywords changed since the CSC columns were built are patched in
+# keyword_counts; once more than this share of rows is patched the keyword
+# arrays are rebuilt, so each update costs amortized O(1) keyword work
+KEYWORD_PATCH_SHARE = 0.01
+KEYWORD_PATCH_MIN = 256
+
+# (field, alternatives weight, fallback weight), in tenths like scoring.match_points
+_TIER_WEIGHTS = (
+    ("category", 30, 100),
+    ("author", 30, 100),
+    ("target_audience", 20, 50),
+    ("language", 10, 30),
+    ("book_type", 20, 20),
+)
+
+
+class ColumnarCatalog:
+    """Array-backed copy of the compiled records for batch scoring.
+
+    Text fields are integer-coded (one vocabulary per field), ratings a
+    float64 column, and keywords a sparse book x keyword incidence matrix
+    kept both row-wise (CSR: keyword ids per book) and column-wise (CSC:
+    book ids per keyword). Scoring a query is one vectorized pass.
+
+    Rows can be changed in place (append_row / set_row / delete_row). The
+    per-row columns keep spare capacity, and rows whose keywords changed
+    live in `kw_patches` until the next compaction.
+    """
+
+    def __init__(self, records):
+        self.size = len(records)
+        self.vocab = {field: {} for field in INDEXED_FIELDS}
+        self.codes = {}
+        for field in INDEXED_FIELDS:
+            vocab = self.vocab[field]
+            self.codes[field] = np.fromiter(
+                (_REMOVED if r is None else vocab.setdefault(getattr(r, field), len(vocab)) for r in records),
+                dtype=np.int32, count=self.size)
+        self.ratings = np.fromiter((np.nan if r is None else r.rating for r in records),
+                                   dtype=np.float64, count=self.size)
+        self.alive = np.fromiter((r is not None for r in records), dtype=bool, count=self.size)
+
+        # CSR rows: keyword ids of book i are kw_indices[kw_indptr[i]:kw_indptr[i + 1]]
+        self.keyword_vocab = {}
+        lengths = np.fromiter((0 if r is None else len(r.keywords) for r in records),
+                              dtype=np.int64, count=self.size)
+        self.kw_indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.kw_indptr[1:])
+        kw_vocab = self.keyword_vocab
+        self.kw_indices = np.fromiter(
+            (kw_vocab.setdefault(kw, len(kw_vocab)) for r in records if r is not None for kw in sorted(r.keywords)),
+            dtype=np.int32, count=int(self.kw_indptr[-1]))
+        self.kw_patches = {}  # row -> frozenset of keyword ids, for rows the CSR/CSC arrays don't reflect
+        self._build_keyword_columns(np.repeat(np.arange(self.size, dtype=np.int32), lengths))
+        self._buffers = dict(self._row_columns())
+
+    def _build_keyword_columns(self, rows):
+        """CSC from the CSR arrays; `rows` is the row of each kw_indices entry"""
+        # CSC columns: books having keyword k are kw_books[kw_books_indptr[k]:kw_books_indptr[k + 1]]
+        order = np.argsort(self.kw_indices, kind="stable")
+        self.kw_books = rows[order]
+        self.kw_books_indptr = np.zeros(len(self.keyword_vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.kw_indices, minlength=len(self.keyword_vocab)), out=self.kw_books_indptr[1:])
+
+    @classmethod
+    def from_arrays(cls, codes, vocab, ratings, kw_indptr, kw_indices, kw_books_indptr, kw_books,
+                    keyword_vocab):
+        """Wrap existing arrays (e.g. memory-mapped ones) without copying them.
+
+        `vocab` and `keyword_vocab` only need a .get(value, default) method.
+        """
+        columns = cls.__new__(cls)
+        columns.size = len(ratings)
+        columns.codes = codes
+        columns.vocab = vocab
+        columns.ratings = ratings
+        columns.kw_indptr = kw_indptr
+        columns.kw_indices = kw_indices
+        columns.kw_books_indptr = kw_books_indptr
+        columns.kw_books = kw_books
+        columns.keyword_vocab = keyword_vocab
+        columns.alive = np.ones(columns.size, dtype=bool)
+        columns.kw_patches = {}
+        columns._buffers = dict(columns._row_columns())
+        return columns
+
+    def __len__(self):
+        return self.size
+
+    # --------------------------
+    # In-place row changes
+    # --------------------------
+    def append_row(self, record):
+        """Add a row for a new record at the end (amortized O(1))"""
+        if self.size == len(self._buffers["ratings"]):
+            self._grow()
+        self.size += 1
+        self._reslice()
+        self.set_row(self.size - 1, record)
+
+    def set_row(self, row, record):
+        """Overwrite one row with a record's values"""
+        for field in INDEXED_FIELDS:
+            vocab = self.vocab[field]
+            self.codes[field][row] = vocab.setdefault(getattr(record, field), len(vocab))
+        self.ratings[row] = record.rating
+        self.alive[row] = True
+        kw_vocab = self.keyword_vocab
+        self._patch_keywords(row, frozenset(kw_vocab.setdefault(kw, len(kw_vocab)) for kw in record.keywords))
+
+    def delete_row(self, row):
+        """Blank one row so that it matches and scores nothing"""
+        for field in INDEXED_FIELDS:
+            self.codes[field][row] = _REMOVED
+        self.ratings[row] = np.nan
+        self.alive[row] = False
+        self._patch_keywords(row, frozenset())
+
+    # Per-row columns live in buffers with spare capacity; the public
+    # attributes are views of their first `size` entries
+    def _row_columns(self):
+        return [("ratings", self.ratings), ("alive", self.alive)] + [(field, self.codes[field])
+                                                                     for field in INDEXED_FIELDS]
+
+    def _grow(self):
+        capacity = max(16, 2 * self.size)
+        for name, column in self._row_columns():
+            buffer = np.empty(capacity, dtype=column.dtype)
+            buffer[:self.size] = column
+            self._buffers[name] = buffer
+
+    def _reslice(self):
+        buffers = self._buffers
+        self.ratings = buffers["ratings"][:self.size]
+        self.alive = buffers["alive"][:self.size]
+        for field in INDEXED_FIELDS:
+            self.codes[field] = buffers[field][:self.size]
+
+    def _patch_keywords(self, row, keyword_ids):
+        self.kw_patches[row] = keyword_ids
+        if len(self.kw_patches) > max(KEYWORD_PATCH_MIN, self.size * KEYWORD_PATCH_SHARE):
+            self.compact_keywords()
+
+    def compact_keywords(self):
+        """Fold kw_patches into the CSR and CSC arrays (one pass over all keywords)"""
+        base_rows = len(self.kw_indptr) - 1
+        entry_rows = np.repeat(np.arange(base_rows, dtype=np.int32), np.diff(self.kw_indptr))
+        patched = np.fromiter(self.kw_patches, dtype=np.int32, count=len(self.kw_patches))
+        keep = ~np.isin(entry_rows, patched)
+        patch_rows = np.repeat(patched, [len(self.kw_patches[row]) for row in patched.tolist()])
+        patch_ids = np.fromiter((k for row in patched.tolist() for k in sorted(self.kw_patches[row])),
+                                dtype=np.int32, count=len(patch_rows))
+        rows = np.concatenate((entry_rows[keep], patch_rows))
+        order = np.argsort(rows, kind="stable")
+        rows = rows[order]
+        self.kw_indices = np.concatenate((self.kw_indices[keep], patch_ids))[order]
+        self.kw_indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=self.size), out=self.kw_indptr[1:])
+        self._build_keyword_columns(rows)
+        self.kw_patches = {}
+
+    # --------------------------
+    # Scoring
+    # --------------------------
+    def exact_candidates(self, query):
+        """CatalogIndex.exact_candidates as one vectorized pass (same ids, same order)"""
+        mask = self.alive.copy()
+        for field in INDEXED_FIELDS:
+            value = getattr(query, field)
+            if value:
+                mask &= self.field_matches(field, value)
+        if query.keywords:
+            mask &= self.keyword_counts(match_keywords(query)) > 0
+        if query.rating:
+            mask &= np.abs(self.ratings - query.rating) <= RATING_TOLERANCE
+        return np.flatnonzero(mask).tolist()
+
+    def field_matches(self, field, value):
+        """Boolean column: which books have this normalized field value"""
+        return self.codes[field] == self.vocab[field].get(value, _MISSING)
+
+    def keyword_counts(self, keywords):
+        """Per-book number of shared keywords (the incidence matrix times the query vector)"""
+        counts = np.zeros(self.size, dtype=np.int32)
+        query_ids = set()
+        for kw in keywords:
+            k = self.keyword_vocab.get(kw)
+            if k is None:
+                continue
+            query_ids.add(k)
+            counts[self._keyword_books(k)] += 1
+        if self.kw_patches and query_ids:
+            rows = np.fromiter(self.kw_patches, dtype=np.int64, count=len(self.kw_patches))
+            counts[rows] = [len(self.kw_patches[row] & query_ids) for row in rows.tolist()]
+        return counts
+
+    def keyword_tenths(self, query):
+        """catalog.keyword_tenths for every book at once"""
+        if query.keyword_weights is None:
+            return self.keyword_counts(query.keywords) * 10
+        total = np.zeros(self.size, dtype=np.int32)
+        for weights in query.keyword_weights:
+            best = np.zeros(self.size, dtype=np.int32)
+            by_id = {}
+            for kw, tenths in weights:
+                k = self.keyword_vocab.get(kw)
+                if k is None:
+                    continue
+                by_id[k] = tenths
+                books = self._keyword_books(k)
+                best[books] = np.maximum(best[books], tenths)
+            if self.kw_patches and by_id:
+                rows = np.fromiter(self.kw_patches, dtype=np.int64, count=len(self.kw_patches))
+                best[rows] = [max((by_id.get(k, 0) for k in self.kw_patches[row]), default=0)
+                              for row in rows.tolist()]
+            total += best
+        return total
+
+    def _keyword_books(self, k):
+        # Keywords first seen after the last compaction have no CSC column yet
+        if k + 1 < len(self.kw_books_indptr):
+            return self.kw_books[self.kw_books_indptr[k]:self.kw_books_indptr[k + 1]]
+        return self.kw_books[:0]
+
+    def alternative_scores(self, query):
+        """scoring.alternative_score for every book at once; 0 where it returns None"""
+        return self.tier_scores(query, 0)[0]
+
+    def fallback_scores(self, query, total_possible):
+        """scoring.fallback_score for every book; -1 where it returns None"""
+        return self.tier_scores(query, total_possible)[1]
+
+    def tier_scores(self, query, total_possible):
+        """scoring.match_points for every book in one pass over the columns.
+
+        Returns the alternative scores (0 where there are none), the fallback
+        percentages (-1 where there are none), the ids sharing the category
+        or author, in catalog order, and each book's scoring.Match mask.
+        """
+        # In tenths, like scoring.match_points
+        relevance = np.zeros(self.size, dtype=np.int32)
+        points = np.zeros(self.size, dtype=np.int32)
+        related = np.zeros(self.size, dtype=bool)
+        fields = np.zeros(self.size, dtype=np.uint8)
+        if query.keywords:
+            tenths = self.keyword_tenths(query)
+            relevance += tenths * 2
+            points += tenths * 5
+        for field, alternative_weight, fallback_weight in _TIER_WEIGHTS:
+            value = getattr(query, field)
+            if value:
+                matches = self.field_matches(field, value)
+                relevance += matches * alternative_weight
+                points += matches * fallback_weight
+                fields |= matches.astype(np.uint8) * np.uint8(FIELD_BITS[field])
+                if field in ("category", "author"):
+                    related |= matches
+        if query.rating is not None:
+            distance = np.abs(self.ratings - query.rating)
+            close = distance <= RATING_TOLERANCE
+            fields |= close.astype(np.uint8) * np.uint8(RATING_BIT)
+            if query.rating:
+                relevance += close * 20
+            points += np.where(distance <= FALLBACK_CLOSE_RATING, 60,
+                               np.where(distance <= RATING_TOLERANCE, 30, 0)).astype(np.int32)
+
+        alternatives = np.where(relevance > 0, np.minimum(100, relevance), 0)
+        if total_possible > 0:
+            percentage = np.minimum(np.floor((points / (total_possible * 10)) * 100), 100).astype(np.int32)
+        else:
+            percentage = np.zeros(self.size, dtype=np.int32)
+        return alternatives, np.where(points > 0, percentage, -1), np.flatnonzero(related), fields
+
+
+def top_k_indices(scores, k, threshold=0):
+    """Indices of the k best scores above `threshold`, best first, ties in catalog order"""
+    candidates = np.flatnonzero(scores > threshold)
+    if len(candidates) > k:
+        values = scores[candidates]
+        # k-th best score; everything above it is in, ties at it fill the rest in index order
+        kth = -np.partition(-values, k - 1)[k - 1]
+        above = candidates[values > kth]
+        ties = candidates[values == kth][:k - len(above)]
+        candidates = np.concatenate((above, ties))
+    values = scores[candidates]
+    return candidates[np.lexsort((candidates, -values))], int(np.count_nonzero(scores > threshold))
@@ -1,69 +1,203 @@
 # controller.py
+import json
+from collections import namedtuple
+from collections.abc import Sequence
+from functools import lru_cache
+
+from catalog import BookRecord, QueryRecord, compile_book, compile_query, expanded_keywords
+from facts import Book
+from scoring import FIELD_BITS, Match, match_record, query_fields
+from tracing import logger
+
+# Recommendations shown per page
+PAGE_SIZE = 10
+
+# One page of a RecommendationResult: its items and records, the cursor of
+# the next page (None after the last one), how many items there are in all
+# and, when the tier recorded them, the scoring.Match of each item
+ResultPage = namedtuple("ResultPage", ("items", "records", "cursor", "total", "matches"), defaults=(None,))
+
+# Shown in place of a book that cannot be converted
+ERROR_BOOK = {
+    "title": "Error Processing Book",
+    "category": "Unknown",
+    "author": "Unknown",
+    "rating": 0.0,
+    "target_audience": "N/A",
+    "language": "Unknown",
+    "book_type": "N/A",
+    "keywords": ()
+}
+
 
 def converFact_to_string(fact):
     """
-    Convert BookFact or dict to standardized dictionary format
+    Convert Book, BookFact or dict to standardized dictionary format.
+
+    A catalog Book returns its precomputed, read-only display payload (see
+    facts.Book.display), so showing a book again costs no conversion.
     """
+    if type(fact) is Book:
+        return fact.display()
     try:
-        # Check if it's a dictionary first
-        if isinstance(fact, dict):
-            return {
-                "title": fact.get("title", "Unknown Title"),
-                "category": fact.get("category", "Unknown Category"),
-                "author": fact.get("author", "Unknown Author"),
-                "rating": float(fact.get("rating", 0.0)),
-                "target_audience": fact.get("target_audience", "N/A"),
-                "language": fact.get("language", "Unknown Language"),
-                "book_type": fact.get("book_type", "N/A"),
-                "keywords": list(fact.get("keywords", []))
-            }
-        
-        # It's a BookFact object - use as_dict() method to get actual values
-        # Experta Fact objects have an as_dict() method that returns the actual values
-        if hasattr(fact, 'as_dict'):
-            fact_dict = fact.as_dict()
-            # Convert keywords set to list if needed
-            keywords = fact_dict.get('keywords', set())
-            if isinstance(keywords, set):
-                keywords = list(keywords)
-            elif not isinstance(keywords, list):
-                keywords = list(keywords) if keywords else []
-            
-            return {
-                "title": fact_dict.get("title", "Unknown Title"),
-                "category": fact_dict.get("category", "Unknown Category"),
-                "author": fact_dict.get("author", "Unknown Author"),
-                "rating": float(fact_dict.get("rating", 0.0)),
-                "target_audience": fact_dict.get("target_audience", "N/A"),
-                "language": fact_dict.get("language", "Unknown Language"),
-                "book_type": fact_dict.get("book_type", "N/A"),
-                "keywords": keywords
-            }
-        else:
-            # Fallback if as_dict() doesn't exist (shouldn't happen with experta)
-            raise AttributeError("Fact object doesn't have as_dict() method")
-            
-    except Exception as e:
-        print(f"Error in converFact_to_string: {e}")
-        import traceback
-        traceback.print_exc()
-        # Return safe default
-        return {
-            "title": "Error Processing Book",
-            "category": "Unknown",
-            "author": "Unknown",
-            "rating": 0.0,
-            "target_audience": "N/A",
-            "language": "Unknown",
-            "book_type": "N/A",
-            "keywords": []
-        }
-
-
-response = {
-    "response_messege": "",
-    "response_data": []
-}
+        return Book.from_book(fact).display()
+    except Exception:
+        logger.exception("Error in converFact_to_string: cannot convert %r", fact)
+        return dict(ERROR_BOOK)
+
+
+class LazyBooks(Sequence):
+    """Book dicts for a list of BookRecords, converted only when read.
+
+    A broad query can match most of the catalog; only the books a page
+    actually shows go through converFact_to_string.
+    """
+
+    __slots__ = ("records",)
+
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [converFact_to_string(record.book) for record in self.records[index]]
+        return converFact_to_string(self.records[index].book)
+
+    def __eq__(self, other):
+        if not isinstance(other, (LazyBooks, list)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"LazyBooks({len(self)} books)"
+
+
+class ExactMatches(Sequence):
+    """scoring.Match of each exact match, built as pages are read.
+
+    Every exact match meets every criterion the query gave, so only the
+    shared keywords differ from one book to the next.
+    """
+
+    def __init__(self, records, query):
+        self.records = records
+        self.fields = query_fields(query)
+        self.keywords = expanded_keywords(query)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _match(self, record):
+        return Match(self.fields, tuple(record.keywords & self.keywords) if self.keywords else ())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._match(record) for record in self.records[index]]
+        return self._match(self.records[index])
+
+    def __repr__(self):
+        return f"ExactMatches({len(self)} books)"
+
+
+class RecommendationResult:
+    """Outcome of one recommendation query.
+
+    Each query gets its own result, so concurrent sessions and threads never
+    share state. `items` holds book dicts, or (book dict, score) pairs for the
+    scored tiers; `records` the catalog.BookRecord behind each item. Large
+    tiers hold a LazyBooks, so read them a page at a time (page()).
+    """
+
+    def __init__(self):
+        self.message = ""
+        self.items = []
+        self.records = []
+        self.tier = None  # "exact", "alternatives", "fallback", "partial", "popular" or "none"
+        self.timings = {}  # stage name -> seconds
+        self.candidates = {}  # rule name -> books it matched
+        self.catalog_version = None  # Catalog.version the query ran against
+        self.matches = None  # scoring.Match of each item, when the tier recorded them
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def update(self, message, items, records, tier, matches=None):
+        self.message = message
+        self.items = items
+        self.records = records
+        self.tier = tier
+        self.matches = matches
+
+    def page(self, cursor=0, size=PAGE_SIZE):
+        """The `size` items starting at `cursor`; pass the returned cursor for the next page"""
+        cursor = cursor or 0
+        end = min(cursor + size, len(self.items))
+        matches = self.matches[cursor:end] if self.matches is not None else None
+        return ResultPage(self.items[cursor:end], self.records[cursor:end],
+                          end if end < len(self.items) else None, len(self.items), matches)
+
+    @property
+    def scores(self):
+        """Score of each item, or None for unscored tiers"""
+        if isinstance(self.items, LazyBooks):
+            return [None] * len(self.items)
+        return [item[1] if isinstance(item, tuple) else None for item in self.items]
+
+    def as_dict(self, cursor=None, size=None):
+        """JSON-friendly form for the batch API and other non-UI callers.
+
+        With a page `size`, only the page starting at `cursor` is included,
+        along with the next page's cursor and the total number of items.
+        """
+        payload = {"tier": self.tier, "message": self.message}
+        items = self.items
+        if size is not None:
+            page = self.page(cursor, size)
+            items = page.items
+            payload.update(cursor=page.cursor, total=page.total)
+        payload["recommendations"] = [
+            {"book": item[0], "score": item[1]} if isinstance(item, tuple) else {"book": item, "score": None}
+            for item in items
+        ]
+        return payload
+
+    def as_json(self, cursor=None, size=None):
+        """as_dict() encoded as UTF-8 JSON.
+
+        Catalog books are spliced in as their pre-encoded payloads
+        (facts.Book.json), so a page costs a join rather than encoding every
+        book again.
+        """
+        head = {"tier": self.tier, "message": self.message}
+        start, end = 0, len(self.items)
+        if size is not None:
+            start = cursor or 0
+            end = min(start + size, len(self.items))
+            head.update(cursor=end if end < len(self.items) else None, total=len(self.items))
+        # LazyBooks items are only their records' books, unscored; don't convert them
+        items = None if isinstance(self.items, LazyBooks) else self.items[start:end]
+        records = self.records[start:end]
+        entries = []
+        for position in range(end - start):
+            item = items[position] if items is not None else None
+            book, score = item if isinstance(item, tuple) else (item, None)
+            record = records[position] if position < len(records) else None
+            if record is not None and type(record.book) is Book:
+                encoded = record.book.json()
+            else:
+                encoded = json.dumps(book, ensure_ascii=False).encode("utf-8")
+            if score is None:
+                score = b"null"
+            else:
+                score = (str(score) if type(score) is int else json.dumps(score)).encode("utf-8")
+            entries.append(b'{"book": ' + encoded + b', "score": ' + score + b"}")
+        return (json.dumps(head, ensure_ascii=False).encode("utf-8")[:-1]
+                + b', "recommendations": [' + b", ".join(entries) + b"]}")
 
 
 def get_book(book: dict):
@@ -108,68 +242,74 @@ Keywords: {', '.join(book.get('keywords', []))}
 def generate_recommendation_explanation(book, user_params):
     """
     Generate an explanation for why a book is being recommended
-    based on user preferences
+    based on user preferences. `book` may be a catalog.BookRecord (no
+    re-normalization) or a book dict; `user_params` a dict or QueryRecord.
     """
-    reasons = []
-    
-    # Extract book data safely
-    if hasattr(book, 'as_dict'):
-        book_dict = book.as_dict()
-    else:
-        book_dict = book
-    
-    # Get book fields
-    book_title = book_dict.get('title', 'Unknown Title')
-    book_category = book_dict.get('category', '')
-    book_author = book_dict.get('author', '')
-    book_keywords = book_dict.get('keywords', set())
-    book_target = book_dict.get('target_audience', '')
-    book_language = book_dict.get('language', '')
-    book_type = book_dict.get('book_type', '')
-    
-    # Get user preferences
-    user_cat = user_params.get('category', '').lower() if user_params.get('category') else ''
-    user_author = user_params.get('author', '').lower() if user_params.get('author') else ''
-    user_keywords = user_params.get('keywords', set())
-    user_target = user_params.get('target_audience', '').lower() if user_params.get('target_audience') else ''
-    user_language = user_params.get('language', '').lower() if user_params.get('language') else ''
-    user_type = user_params.get('book_type', '').lower() if user_params.get('book_type') else ''
-    
-    # Build explanation based on matches
-    if user_cat and book_category.lower() == user_cat:
-        reasons.append(f"it matches your preferred **{book_category}** category")
-    
-    if user_author and book_author.lower() == user_author:
-        reasons.append(f"it's written by your preferred author **{book_author}**")
-    
-    # Keyword matches
-    if user_keywords and book_keywords:
-        book_keywords_lower = {str(k).lower() for k in book_keywords}
-        user_keywords_lower = {str(k).lower() for k in user_keywords}
-        common_keywords = book_keywords_lower.intersection(user_keywords_lower)
-        if common_keywords:
-            keyword_list = ", ".join([f"**{kw}**" for kw in common_keywords])
-            reasons.append(f"it covers topics you're interested in: {keyword_list}")
-    
-    if user_target and book_target.lower() == user_target:
-        reasons.append(f"it's perfect for **{book_target}** audience")
-    
-    if user_language and book_language.lower() == user_language:
-        reasons.append(f"it's available in your preferred **{book_language}** language")
-    
-    if user_type and book_type.lower() == user_type:
-        reasons.append(f"it's the **{book_type}** format you wanted")
-    
+    return explain_recommendations([book], user_params)[0]
+
+
+def explain_recommendations(books, user_params):
+    """generate_recommendation_explanation for a whole page of books, with
+    the query compiled and its keyword expansion collected once"""
+    query = user_params if isinstance(user_params, QueryRecord) else compile_query(user_params)
+    # Keyword matches include the close matches a fuzzy query was expanded to
+    query_keywords = expanded_keywords(query)
+    # Compare the pre-normalized catalog records with the query normalized once
+    explanations = []
+    for book in books:
+        record = book if isinstance(book, BookRecord) else compile_book(book)
+        explanations.append(explain_match(record.book, match_record(record, query, query_keywords)))
+    return explanations
+
+
+# Reason of each matched criterion, in the order explanations list them
+_REASONS = (
+    ("category", "it matches your preferred **{}** category"),
+    ("author", "it's written by your preferred author **{}**"),
+    ("keywords", "it covers topics you're interested in: {}"),
+    ("target_audience", "it's perfect for **{}** audience"),
+    ("language", "it's available in your preferred **{}** language"),
+    ("book_type", "it's the **{}** format you wanted"),
+)
+
+
+@lru_cache(maxsize=None)
+def _template(fields, has_keywords):
+    """The explanation format of one Match mask, and the book fields it fills in"""
+    reasons, filled = [], []
+    for field, reason in _REASONS:
+        if field == "keywords":
+            if not has_keywords:
+                continue
+        elif not fields & FIELD_BITS[field]:
+            continue
+        reasons.append(reason)
+        filled.append(field)
+
     # If no specific reasons found, provide a general explanation
     if not reasons:
-        return f"**{book_title}** is recommended based on your overall preferences."
-    
+        return "**{}** is recommended based on your overall preferences.", ()
+
     # Combine reasons into a natural sentence
     if len(reasons) == 1:
-        explanation = f"**{book_title}** is recommended because {reasons[0]}."
+        sentence = reasons[0]
     elif len(reasons) == 2:
-        explanation = f"**{book_title}** is recommended because {reasons[0]} and {reasons[1]}."
+        sentence = f"{reasons[0]} and {reasons[1]}"
     else:
-        explanation = f"**{book_title}** is recommended because {', '.join(reasons[:-1])}, and {reasons[-1]}."
-    
-    return explanation
\ No newline at end of file
+        sentence = f"{', '.join(reasons[:-1])}, and {reasons[-1]}"
+    return "**{}** is recommended because " + sentence + ".", tuple(filled)
+
+
+def explain_match(book, match):
+    """The explanation of one result from the scoring.Match its scorer
+    recorded: a precompiled template filled in, with no comparison"""
+    template, fields = _template(match.fields, bool(match.keywords))
+    # Original spelling for display, from the book's cached view
+    view = book.display() if type(book) is Book else Book.from_book(book).display()
+    values = [view["title"]]
+    for field in fields:
+        if field == "keywords":
+            values.append(", ".join([f"**{kw}**" for kw in match.keywords]))
+        else:
+            values.append(view[field])
+    return template.format(*values)
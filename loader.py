@@ -0,0 +1,174 @@
+# loader.py
+"""
+Load a catalog from CSV or JSONL instead of the literals in facts.py.
+
+    python loader.py books.csv [--chunk-size 10000] [--rating-policy max|min|mean|first|last|keep]
+
+CSV files need a header row using the BookFact field names; keywords are
+separated by ";", "|" or ",". JSONL records may give keywords as a list.
+Rows are read and compiled one chunk at a time, so only a single chunk of
+raw rows is ever held in memory. Books sharing a normalized title and
+author are merged into one record (see catalog.dedupe_records); the
+report says how many. Binary snapshots (.snap, built by
+snapshot.py) are memory-mapped rather than read row by row.
+"""
+import argparse
+import csv
+import json
+import math
+import re
+import resource
+import sys
+import time
+from itertools import islice
+
+from catalog import DEFAULT_RATING_POLICY, RATING_POLICIES, Catalog, compile_book
+from tracing import logger
+
+TEXT_FIELDS = ("title", "category", "author", "target_audience", "language", "book_type")
+CHUNK_SIZE = 10_000
+
+_KEYWORD_SEPARATORS = re.compile(r"[;|,]")
+
+
+class LoadReport:
+    """What a load did: rows read, rejected, duplicates merged, wall time and peak RSS"""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.loaded = 0
+        self.rejected = 0
+        self.merged = 0
+        self.seconds = 0.0
+        self.peak_rss_mb = 0.0
+
+    def __str__(self):
+        return (f"📚 {self.path}: {self.loaded} books loaded, {self.merged} duplicates merged, {self.rejected} rejected "
+                f"of {self.rows} rows in {self.seconds:.2f}s, peak RSS {self.peak_rss_mb:.0f} MB")
+
+
+def iter_rows(path):
+    """Raw rows from a .csv or .jsonl/.json file, read lazily.
+
+    CSV rows come as dicts; JSONL rows as their unparsed lines, so that
+    coerce_book can reject a malformed line like any other bad row.
+    """
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    yield line
+
+
+def coerce_book(row):
+    """Validate one raw row into a book dict, as BookFact.__init__ would.
+
+    `row` is a dict or a JSON object as text. Keywords become a set (from a
+    list, tuple or delimited string) and a missing rating defaults to 0.0.
+    Raises ValueError for malformed JSON, rows that are not objects, rows
+    without a title and ratings that are not finite numbers.
+    """
+    if isinstance(row, str):
+        # json.JSONDecodeError is a ValueError
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError(f"expected an object, got {type(row).__name__}")
+    book = {}
+    for field in TEXT_FIELDS:
+        value = row.get(field)
+        if value is not None:
+            value = str(value).strip()
+            if value:
+                book[field] = value
+    if "title" not in book:
+        raise ValueError("missing title")
+
+    keywords = row.get("keywords")
+    if isinstance(keywords, str):
+        keywords = _KEYWORD_SEPARATORS.split(keywords)
+    elif keywords is not None and not isinstance(keywords, (list, tuple, set)):
+        raise ValueError(f"invalid keywords {keywords!r}")
+    book["keywords"] = {k for k in (str(k).strip() for k in keywords or ()) if k}
+
+    rating = row.get("rating")
+    if rating is None or (isinstance(rating, str) and not rating.strip()):
+        book["rating"] = 0.0
+    else:
+        try:
+            book["rating"] = float(rating)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid rating {rating!r}")
+        # "nan" and "inf" parse, but a NaN would break the sorted ratings in CatalogIndex
+        if not math.isfinite(book["rating"]):
+            raise ValueError(f"invalid rating {rating!r}")
+    return book
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_catalog(path, chunk_size=CHUNK_SIZE, rating_policy=DEFAULT_RATING_POLICY):
+    """Stream a catalog file into a compiled Catalog; returns (catalog, LoadReport).
+
+    Duplicates are merged under `rating_policy` (None keeps them all). A
+    .snap file (see snapshot.py) is memory-mapped instead of parsed; it was
+    deduplicated when it was built.
+    """
+    report = LoadReport(path)
+    start = time.perf_counter()
+    if path.lower().endswith(".snap"):
+        from snapshot import open_snapshot
+        catalog = open_snapshot(path)
+        report.rows = report.loaded = len(catalog)
+        report.seconds = time.perf_counter() - start
+        report.peak_rss_mb = peak_rss_mb()
+        return catalog, report
+
+    records = []
+    rows = iter_rows(path)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        for row in chunk:
+            report.rows += 1
+            try:
+                records.append(compile_book(coerce_book(row)))
+            except ValueError as exc:
+                report.rejected += 1
+                logger.debug("⚠️ %s row %d rejected: %s", path, report.rows, exc)
+        # Drop the raw rows before reading the next chunk
+        del chunk
+
+    if report.rejected:
+        logger.warning("⚠️ %s: %d of %d rows rejected", path, report.rejected, report.rows)
+    catalog = Catalog([record.book for record in records], records, rating_policy)
+    del records
+    report.merged = catalog.merged
+    report.loaded = len(catalog)
+    report.seconds = time.perf_counter() - start
+    report.peak_rss_mb = peak_rss_mb()
+    return catalog, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load and compile a catalog file.")
+    parser.add_argument("path", help="catalog file (.csv, .jsonl or .snap)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--rating-policy", choices=[*RATING_POLICIES, "keep"], default=DEFAULT_RATING_POLICY,
+                        help='how merged duplicates get their rating; "keep" leaves duplicates alone')
+    args = parser.parse_args(argv)
+    policy = None if args.rating_policy == "keep" else args.rating_policy
+    _, report = load_catalog(args.path, args.chunk_size, policy)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
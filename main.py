@@ -1,38 +1,102 @@
 # main.py
 from experta import Rule, KnowledgeEngine, MATCH
-from controller import converFact_to_string, response
+from controller import ExactMatches, LazyBooks, RecommendationResult, converFact_to_string
 from facts import knowledge_base, BookFact
+from catalog import get_catalog, normalize_kw, normalize_text, book_value
+from scoring import NO_MATCH, score_tiers
+from tracing import QueryTrace, logger
+from itertools import islice
 import math
 
-class LibraryExpertSystem(KnowledgeEngine):
-    def __init__(self, knowledge_base):
+# How many alternatives suggest_alternatives returns
+ALTERNATIVES_LIMIT = 5
+# How many books the fallback tiers return
+FALLBACK_LIMIT = 10
+POPULAR_LIMIT = 5
+
+EXACT_MESSAGE = "Based on your preferences, these books match exactly what you're looking for:"
+ALTERNATIVES_MESSAGE = "Here are some alternative recommendations based on your preferences:"
+NO_MATCH_MESSAGE = "No books found matching your preferences. You can explore any book you like."
+RELATED_MESSAGE = "Here are some books related to your search:"
+POPULAR_MESSAGE = "Here are some popular books from our collection:"
+
+
+def present_fallback(result, catalog, tiers):
+    """Fill an empty result from the weighted fallback search, then the
+    category/author matches, then the first books of the catalog."""
+    # Only the top 10 are converted to dicts
+    top = tiers.fallback
+    if top.results:
+        result.update(f"Here are {top.candidates} books that match your preferences:",
+                      [(converFact_to_string(record.book), score) for record, score in top.results],
+                      [record for record, _ in top.results], "fallback", top.matches)
+    elif tiers.partial:
+        result.update(RELATED_MESSAGE, [converFact_to_string(record.book) for record in tiers.partial],
+                      list(tiers.partial), "partial", tiers.partial_matches)
+    else:
+        # Last resort: show general books, which matched nothing
+        general_recs = list(islice(catalog.live_records(), POPULAR_LIMIT))
+        result.update(POPULAR_MESSAGE, [converFact_to_string(record.book) for record in general_recs],
+                      general_recs, "popular", [NO_MATCH] * len(general_recs))
+    return result
+
+
+class LibraryEngineBase(KnowledgeEngine):
+    """What every recommendation engine shares: the compiled catalog and a
+    per-query trace and result. Subclasses supply the rules."""
+
+    def __init__(self, knowledge_base, catalog=None):
         super().__init__()
         self.knowledge_base = knowledge_base
-        self.inferred_books = []
-        self.alternatives = []
+        # Normalized records and indexes, compiled once per book list
+        self.catalog = catalog if catalog is not None else get_catalog(knowledge_base)
+        self.trace = QueryTrace()
+        self.result = RecommendationResult()
+
+    def run(self, steps=float('inf')):
+        """Run the agenda and return this query's RecommendationResult"""
+        self.trace = QueryTrace()
+        self.result = RecommendationResult()
+        super().run(steps)
+        for stats in self.trace.rules:
+            self.result.timings[stats.name] = stats.seconds
+            self.result.candidates[stats.name] = stats.matched
+        self.trace.report()
+        return self.result
 
     def normalize_kw(self, kw_set):
         """Normalize keywords for comparison"""
-        if not kw_set:
-            return set()
-        return set([str(k).strip().lower() for k in kw_set])
+        return normalize_kw(kw_set)
 
     def normalize_text(self, text):
         """Normalize text fields for comparison"""
-        if not text:
-            return ""
-        return str(text).strip().lower()
+        return normalize_text(text)
 
     def get_book_field(self, book, field_name, default=None):
         """Safely get field from book whether it's a BookFact object or dict"""
-        if hasattr(book, field_name):
-            return getattr(book, field_name, default)
-        elif isinstance(book, dict) and field_name in book:
-            return book[field_name]
-        return default
+        return book_value(book, field_name, default)
+
+
+class LibraryExpertSystem(LibraryEngineBase):
+    """Rules matching the single user BookFact against the catalog indexes"""
+
+    def __init__(self, knowledge_base, catalog=None):
+        super().__init__(knowledge_base, catalog)
+        self.inferred_books = []
+        self.inferred_records = []
+        self.alternatives = []
+        self.alternative_records = []
+
+    def reset(self, **kwargs):
+        """Clear the previous query's state so a long-lived engine can be reused"""
+        self.inferred_books = []
+        self.inferred_records = []
+        self.alternatives = []
+        self.alternative_records = []
+        super().reset(**kwargs)
 
     # --------------------------
-    # Rule: Exact match - UPDATED WITH DEBUG
+    # Rule: Exact match - index lookup
     # --------------------------
     @Rule(
         BookFact(
@@ -47,85 +111,32 @@ class LibraryExpertSystem(KnowledgeEngine):
         salience=10
     )
     def exact_match(self, category, author, target_audience, language, book_type, keywords, rating):
-        print(f"🚀 RULE FIRED: exact_match")
-        print(f"📝 User input - category: '{category}', author: '{author}', audience: '{target_audience}'")
-        print(f"📝 User input - language: '{language}', book_type: '{book_type}', rating: {rating}")
-        print(f"📝 User keywords: {keywords}")
-        
-        keywords_norm = self.normalize_kw(keywords)
-        print(f"🔧 Normalized keywords: {keywords_norm}")
-
-        matched_books = []
-        
-        for i, book in enumerate(self.knowledge_base):
-            # Get book fields safely
-            book_title = self.get_book_field(book, "title", "Unknown")
-            book_category = self.get_book_field(book, "category", "")
-            book_author = self.get_book_field(book, "author", "")
-            book_audience = self.get_book_field(book, "target_audience", "")
-            book_language = self.get_book_field(book, "language", "")
-            book_book_type = self.get_book_field(book, "book_type", "")
-            book_keywords = self.get_book_field(book, "keywords", set())
-            book_rating = self.get_book_field(book, "rating", 0.0)
-
-            print(f"📚 Checking book {i+1}: '{book_title}'")
-            print(f"   Book details - category: '{book_category}', author: '{book_author}'")
-
-            # Flexible matching with debug
-            category_match = (not category or 
-                            self.normalize_text(book_category) == self.normalize_text(category))
-            print(f"   Category match: {category_match} ('{book_category}' vs '{category}')")
-            
-            author_match = (not author or 
-                          self.normalize_text(book_author) == self.normalize_text(author))
-            print(f"   Author match: {author_match} ('{book_author}' vs '{author}')")
-            
-            audience_match = (not target_audience or 
-                            self.normalize_text(book_audience) == self.normalize_text(target_audience))
-            print(f"   Audience match: {audience_match} ('{book_audience}' vs '{target_audience}')")
-            
-            language_match = (not language or 
-                            self.normalize_text(book_language) == self.normalize_text(language))
-            print(f"   Language match: {language_match} ('{book_language}' vs '{language}')")
-            
-            type_match = (not book_type or 
-                        self.normalize_text(book_book_type) == self.normalize_text(book_type))
-            print(f"   Type match: {type_match} ('{book_book_type}' vs '{book_type}')")
-            
-            # Keyword matching - check if any keyword matches (more flexible)
-            book_keywords_norm = self.normalize_kw(book_keywords)
-            print(f"   Book keywords: {book_keywords_norm}")
-            
-            keyword_match = (not keywords_norm or 
-                           any(kw in book_keywords_norm for kw in keywords_norm))
-            print(f"   Keyword match: {keyword_match}")
-            
-            rating_match = (not rating or 
-                          abs(float(book_rating) - float(rating)) <= 0.5)
-            print(f"   Rating match: {rating_match} ({book_rating} vs {rating})")
-            
-            all_match = (category_match and author_match and audience_match and 
-                        language_match and type_match and keyword_match and rating_match)
-            print(f"   ALL MATCH: {all_match}")
-            
-            if all_match:
-                matched_books.append(converFact_to_string(book))
-                print(f"🎯 MATCH FOUND: {book_title}")
-
-        self.inferred_books = matched_books
-        print(f"📊 Total exact matches found: {len(self.inferred_books)}")
-
-        if self.inferred_books:
-            response.update({
-                "response_messege": "Based on your preferences, these books match exactly what you're looking for:",
-                "response_data": self.inferred_books
-            })
-            print(f"✅ Response updated with {len(self.inferred_books)} books")
-        else:
-            print("❌ No exact matches found, will try alternatives")
+        with self.trace.rule("exact_match") as stats:
+            logger.debug("🚀 exact_match: category=%r author=%r audience=%r language=%r "
+                         "book_type=%r rating=%r keywords=%r",
+                         category, author, target_audience, language, book_type, rating, keywords)
+
+            # Keywords are expanded to the catalog's close matches ("ML" -> "machine learning")
+            query = self.catalog.compile_query(
+                category=category, author=author, target_audience=target_audience,
+                language=language, book_type=book_type, keywords=keywords, rating=rating)
+
+            # Intersect the index posting sets instead of scanning the catalog
+            matched_ids = self.catalog.index.exact_candidates(query)
+            # Snapshot catalogs decode these only as pages of the result are read
+            self.inferred_records = self.catalog.select(matched_ids)
+            # Converted to dicts only as pages of the result are read
+            self.inferred_books = LazyBooks(self.inferred_records)
+            stats.examined = len(matched_ids)
+            stats.matched = len(self.inferred_books)
+
+            if self.inferred_books:
+                self.result.update(EXACT_MESSAGE, self.inferred_books, self.inferred_records, "exact",
+                                   ExactMatches(self.inferred_records, query))
 
     # --------------------------
-    # Rule: Suggest alternatives - UPDATED WITH DEBUG
+    # Rule: Suggest alternatives - top-k ranking, with the fallback tiers
+    # scored in the same pass
     # --------------------------
     @Rule(
         BookFact(
@@ -140,78 +151,28 @@ class LibraryExpertSystem(KnowledgeEngine):
         salience=7
     )
     def suggest_alternatives(self, category, author, target_audience, language, book_type, keywords, rating):
-        print("🚀 RULE FIRED: suggest_alternatives")
-        
         # Only run if no exact matches were found
         if self.inferred_books:
-            print("📌 Exact matches exist, skipping alternatives")
+            logger.debug("📌 suggest_alternatives: exact matches exist, skipping")
             return
 
-        keywords_norm = self.normalize_kw(keywords)
-        self.alternatives = []
-
-        print("🔄 Looking for alternative matches...")
-
-        # Calculate relevance score for alternatives
-        for book in self.knowledge_base:
-            # Get book fields safely
-            book_title = self.get_book_field(book, "title", "Unknown")
-            book_category = self.get_book_field(book, "category", "")
-            book_author = self.get_book_field(book, "author", "")
-            book_audience = self.get_book_field(book, "target_audience", "")
-            book_language = self.get_book_field(book, "language", "")
-            book_book_type = self.get_book_field(book, "book_type", "")
-            book_keywords = self.get_book_field(book, "keywords", set())
-            book_rating = self.get_book_field(book, "rating", 0.0)
-
-            relevance_score = 0
-            book_keywords_norm = self.normalize_kw(book_keywords)
-
-            # Keyword matching (partial matches)
-            if keywords_norm:
-                common_keywords = book_keywords_norm.intersection(keywords_norm)
-                relevance_score += len(common_keywords) * 2
-                print(f"   Keywords match for '{book_title}': {common_keywords} (+{len(common_keywords)*2})")
-
-            # Field matching
-            if category and self.normalize_text(book_category) == self.normalize_text(category):
-                relevance_score += 3
-                print(f"   Category match for '{book_title}': +3")
-            if author and self.normalize_text(book_author) == self.normalize_text(author):
-                relevance_score += 3
-                print(f"   Author match for '{book_title}': +3")
-            if target_audience and self.normalize_text(book_audience) == self.normalize_text(target_audience):
-                relevance_score += 2
-                print(f"   Audience match for '{book_title}': +2")
-            if language and self.normalize_text(book_language) == self.normalize_text(language):
-                relevance_score += 1
-                print(f"   Language match for '{book_title}': +1")
-            if book_type and self.normalize_text(book_book_type) == self.normalize_text(book_type):
-                relevance_score += 2
-                print(f"   Type match for '{book_title}': +2")
-            if rating and abs(float(book_rating) - float(rating)) <= 0.5:
-                relevance_score += 2
-                print(f"   Rating match for '{book_title}': +2")
-
-            # Only include books with some relevance
-            if relevance_score > 0:
-                score = min(100, relevance_score * 10)
-                self.alternatives.append((converFact_to_string(book), score))
-                print(f"🎯 Alternative found: '{book_title}' with score {score}")
-
-        # Sort and limit alternatives
-        self.alternatives.sort(key=lambda x: x[1], reverse=True)
-        self.alternatives = self.alternatives[:5]
-
-        if self.alternatives:
-            response.update({
-                "response_messege": "Here are some alternative recommendations based on your preferences:",
-                "response_data": self.alternatives
-            })
-            print(f"✅ Alternatives updated with {len(self.alternatives)} books")
-        else:
-            response.update({
-                "response_messege": "No books found matching your preferences. You can explore any book you like.",
-                "response_data": []
-            })
-            print("❌ No alternatives found either")
\ No newline at end of file
+        with self.trace.rule("suggest_alternatives") as stats:
+            query = self.catalog.compile_query(
+                category=category, author=author, target_audience=target_audience,
+                language=language, book_type=book_type, keywords=keywords, rating=rating)
+
+            # One pass scores every book for the alternatives and for the fallback tiers
+            tiers = score_tiers(self.catalog, query, ALTERNATIVES_LIMIT, FALLBACK_LIMIT, FALLBACK_LIMIT)
+            top = tiers.alternatives
+            ranked = top.results
+            self.alternative_records = [record for record, _ in ranked]
+            # Only the winners are converted to dicts
+            self.alternatives = [(converFact_to_string(record.book), score) for record, score in ranked]
+            stats.examined = top.examined
+            stats.matched = top.candidates
+
+            if self.alternatives:
+                self.result.update(ALTERNATIVES_MESSAGE, self.alternatives, self.alternative_records, "alternatives",
+                                   top.matches)
+            else:
+                present_fallback(self.result, self.catalog, tiers)
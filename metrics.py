@@ -0,0 +1,178 @@
+# metrics.py
+"""
+Per-stage latency, candidate counts and tier outcomes of every query.
+
+Off by default; LIBRARY_METRICS=1 (or configure_metrics(True)) turns it on
+for the process. Each finished RecommendationResult is folded into
+fixed-bucket histograms, so recording a query is a handful of bisects
+under one lock and memory stays constant. The numbers are exported in
+Prometheus text format (prometheus_text(), GET /metrics in server.py) and
+shown in the Streamlit admin panel.
+
+Stages are whatever a result's timings hold: engine (construction without
+a pool), reset, declare, run, each rule body, fallback and total, plus the
+convert and render stages the callers time with `metrics.timed()`.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+                   2.5, 5.0, 10.0)
+# Upper bounds of the candidate count histogram buckets
+COUNT_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000)
+# Every tier a result can end in, so each is exported even before it is seen
+TIERS = ("exact", "alternatives", "fallback", "partial", "popular", "none")
+
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimated q-quantile, interpolated within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def cumulative(self):
+        """(upper bound label, cumulative count) pairs, ending with +Inf"""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+
+class PipelineMetrics:
+    """Process-wide recommendation metrics; safe to record from many threads"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = {}  # stage -> Histogram of seconds
+            self.candidates = {}  # rule -> Histogram of matched books
+            self.tiers = Counter()
+            self.queries = 0
+            self.cache_hits = 0
+
+    def observe_result(self, result, cached=False):
+        """Fold one finished RecommendationResult in; a `cached` one only counts as a query"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.queries += 1
+            self.tiers[result.tier or "none"] += 1
+            if cached:
+                self.cache_hits += 1
+                return
+            latency, candidates = self.latency, self.candidates
+            for stage, seconds in result.timings.items():
+                (latency.get(stage) or self._histogram(latency, stage, LATENCY_BUCKETS)).observe(seconds)
+            for rule, matched in result.candidates.items():
+                (candidates.get(rule) or self._histogram(candidates, rule, COUNT_BUCKETS)).observe(matched)
+
+    def observe(self, stage, seconds):
+        """Record one stage timed outside the engine (convert, render, ...)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._histogram(self.latency, stage, LATENCY_BUCKETS).observe(seconds)
+
+    def timed(self, stage):
+        """Context manager recording the time spent in its body as `stage`"""
+        return self._timer(stage) if self.enabled else _NULL_TIMER
+
+    @contextmanager
+    def _timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    @staticmethod
+    def _histogram(histograms, name, buckets):
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram(buckets)
+        return histogram
+
+    def summary(self):
+        """Rows for a dashboard: (stage, count, mean ms, p50 ms, p99 ms), slowest p99 first"""
+        with self._lock:
+            rows = [(stage, h.count, h.sum / h.count * 1000, h.quantile(0.5) * 1000, h.quantile(0.99) * 1000)
+                    for stage, h in self.latency.items() if h.count]
+        return sorted(rows, key=lambda row: -row[4])
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += ["# HELP library_queries_total Recommendation queries answered.",
+                      "# TYPE library_queries_total counter",
+                      f"library_queries_total {self.queries}",
+                      "# HELP library_cache_hits_total Queries answered from the result cache.",
+                      "# TYPE library_cache_hits_total counter",
+                      f"library_cache_hits_total {self.cache_hits}",
+                      "# HELP library_tier_total Queries by the tier their result came from.",
+                      "# TYPE library_tier_total counter"]
+            for tier in TIERS + tuple(sorted(set(self.tiers) - set(TIERS))):
+                lines.append(f'library_tier_total{{tier="{tier}"}} {self.tiers[tier]}')
+            lines += _histogram_lines("library_stage_seconds", "Time spent per pipeline stage.", "stage",
+                                      self.latency)
+            lines += _histogram_lines("library_candidates", "Books each rule matched per query.", "rule",
+                                      self.candidates)
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, help_text, label, histograms):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for key in sorted(histograms):
+        histogram = histograms[key]
+        for bound, total in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {total}')
+        lines.append(f'{name}_sum{{{label}="{key}"}} {histogram.sum!r}')
+        lines.append(f'{name}_count{{{label}="{key}"}} {histogram.count}')
+    return lines
+
+
+def configure_metrics(enabled=None):
+    """Turn recording on or off; defaults to $LIBRARY_METRICS"""
+    if enabled is None:
+        enabled = os.environ.get("LIBRARY_METRICS", "").strip().lower() in ("1", "true", "yes", "on")
+    metrics.enabled = bool(enabled)
+    return metrics.enabled
+
+
+# The one registry every part of the pipeline records into
+metrics = PipelineMetrics()
+configure_metrics()
@@ -0,0 +1,72 @@
+# ranking.py
+import heapq
+from collections import namedtuple
+
+# Outcome of ranking a catalog: (item, score) winners best first, how many
+# items were looked at and how many had a score, and, when the scorer
+# recorded them, the scoring.Match of each winner.
+Ranking = namedtuple("Ranking", ("results", "examined", "candidates", "matches"), defaults=(None,))
+
+
+class TopK:
+    """Bounded min-heap keeping the k best scored items.
+
+    Ties keep catalog order (earlier position wins), which is what the old
+    sort(reverse=True) + slice produced.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []  # (score, -position, item); position is unique so items never compare
+        self.examined = 0  # items rank() looked at before stopping
+        self.candidates = 0  # items that had a score at all
+
+    def __len__(self):
+        return len(self.heap)
+
+    def full(self):
+        return len(self.heap) >= self.k
+
+    def min_score(self):
+        return self.heap[0][0] if self.heap else None
+
+    def offer(self, position, score, item):
+        """Consider one scored item; returns True if it entered the top k"""
+        self.candidates += 1
+        entry = (score, -position, item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+            return True
+        if entry[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, entry)
+            return True
+        return False
+
+    def results(self, convert=None):
+        """Winners, best first, as (item, score) pairs; only these get converted"""
+        ordered = sorted(self.heap, key=lambda entry: entry[:2], reverse=True)
+        if convert is None:
+            return [(item, score) for score, _, item in ordered]
+        return [(convert(item), score) for score, _, item in ordered]
+
+
+def rank(items, score, k, upper_bound=None):
+    """Score `items` lazily and keep the best k.
+
+    `score(item)` returns a number, or None to skip the item. When
+    `upper_bound` is the best score any item could reach, scanning stops as
+    soon as the heap is full of items at that bound, since a later item can
+    only tie and ties go to the earlier position.
+    """
+    top = TopK(k)
+    if k <= 0:
+        return top
+    for position, item in enumerate(items):
+        top.examined += 1
+        value = score(item)
+        if value is None:
+            continue
+        top.offer(position, value, item)
+        if upper_bound is not None and top.full() and top.min_score() >= upper_bound:
+            break
+    return top
@@ -0,0 +1,128 @@
+# recommender.py
+import os
+import queue
+import time
+from contextlib import contextmanager
+
+from catalog import get_catalog
+from facts import BookFact
+from main import ALTERNATIVES_LIMIT, FALLBACK_LIMIT, LibraryExpertSystem, present_fallback
+from metrics import metrics
+from rete import ReteLibraryExpertSystem
+from scoring import score_tiers
+
+# Engines kept warm by default in an EnginePool
+ENGINE_POOL_SIZE = 4
+
+# Engine implementations, chosen per deployment with $LIBRARY_ENGINE:
+# "index" matches through the catalog indexes, "rete" through experta's network
+ENGINES = {
+    "index": LibraryExpertSystem,
+    "rete": ReteLibraryExpertSystem,
+}
+DEFAULT_ENGINE = "index"
+
+
+def engine_class(mode=None):
+    """The engine class for `mode`, or for $LIBRARY_ENGINE when not given"""
+    mode = (mode or os.environ.get("LIBRARY_ENGINE") or DEFAULT_ENGINE).strip().lower()
+    if mode not in ENGINES:
+        raise ValueError(f"unknown engine {mode!r}; expected one of {', '.join(ENGINES)}")
+    return ENGINES[mode]
+
+
+def user_fact(user_params):
+    """The single BookFact the rules match on, built from user_params"""
+    return BookFact(
+        category=user_params.get("category"),
+        author=user_params.get("author"),
+        keywords=user_params.get("keywords", set()),
+        target_audience=user_params.get("target_audience"),
+        language=user_params.get("language"),
+        book_type=user_params.get("book_type"),
+        rating=user_params.get("rating"),
+    )
+
+
+def apply_fallback(result, catalog, query):
+    """Fill an empty result from the fallback tiers, scored in one pass"""
+    return present_fallback(result, catalog, score_tiers(catalog, query, ALTERNATIVES_LIMIT, FALLBACK_LIMIT,
+                                                           FALLBACK_LIMIT))
+
+
+class EnginePool:
+    """A bounded set of pre-built engines for one catalog.
+
+    Building an engine compiles experta's Rete network (and, for the "rete"
+    engine, declares the catalog into it); a pooled engine is only reset()
+    between queries. An engine is used by one query at a time, so the pool
+    is safe to share between threads and sessions.
+    """
+
+    def __init__(self, catalog=None, size=ENGINE_POOL_SIZE, mode=None):
+        self.catalog = catalog if catalog is not None else get_catalog()
+        self.size = size
+        self.engine_class = engine_class(mode)
+        self._idle = queue.LifoQueue(maxsize=size)  # most recently used engine first
+        for _ in range(size):
+            self._idle.put(self.engine_class(self.catalog.books, self.catalog))
+
+    @contextmanager
+    def engine(self, timeout=None):
+        """Borrow an engine, waiting for one to be returned if all are busy"""
+        engine = self._idle.get(timeout=timeout)
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+
+def _run_engine(engine, user_params):
+    start = time.perf_counter()
+    engine.reset()
+    reset_done = time.perf_counter()
+    engine.declare(user_fact(user_params))
+    declare_done = time.perf_counter()
+    result = engine.run()
+    result.timings.update(reset=reset_done - start, declare=declare_done - reset_done,
+                          run=time.perf_counter() - declare_done)
+    return result
+
+
+def recommend(user_params, catalog=None, pool=None, mode=None):
+    """Run the whole pipeline for one query and return its RecommendationResult.
+
+    With a pool the query runs on a warm engine; without one an engine of
+    `mode` (see engine_class) is built for this call. Nothing else is shared between calls except the
+    compiled catalog, which the query reads as one version (catalog updates
+    wait for it), so this is safe to call from many sessions or threads at
+    once.
+    """
+    if pool is not None:
+        catalog = pool.catalog
+    elif catalog is None:
+        catalog = get_catalog()
+    start = time.perf_counter()
+
+    with catalog.reading():
+        if pool is not None:
+            with pool.engine() as engine:
+                result = _run_engine(engine, user_params)
+        else:
+            engine_start = time.perf_counter()
+            engine = engine_class(mode)(catalog.books, catalog)
+            engine_time = time.perf_counter() - engine_start
+            result = _run_engine(engine, user_params)
+            result.timings["engine"] = engine_time
+
+        # Fallback: If no recommendations were found, provide some anyway
+        # (the index engine already scored the fallback tiers with its alternatives)
+        if not result:
+            fallback_start = time.perf_counter()
+            apply_fallback(result, catalog, catalog.compile_query(user_params))
+            result.timings["fallback"] = time.perf_counter() - fallback_start
+        result.catalog_version = catalog.version
+
+    result.timings["total"] = time.perf_counter() - start
+    metrics.observe_result(result)
+    return result
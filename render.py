@@ -0,0 +1,152 @@
+# render.py
+"""
+Drawing a page of recommendations in Streamlit.
+
+`ui` is the streamlit module, passed in so the same code can be measured
+outside a running app. Every element call (write, info, columns,
+expander, ...) is one delta message to the browser. The detailed view sends
+about fifteen per book; the compact view draws the whole page as one
+markdown block, so it sends one no matter how many books are on the page.
+
+Pick the view with LIBRARY_RENDER=compact|detailed (compact by default).
+"""
+import os
+
+from controller import converFact_to_string, explain_match, explain_recommendations
+
+RENDER_MODES = ("compact", "detailed")
+DEFAULT_RENDER_MODE = "compact"
+
+
+def render_mode(mode=None):
+    """The view to draw results with: `mode`, else $LIBRARY_RENDER, else compact"""
+    mode = (mode or os.environ.get("LIBRARY_RENDER") or DEFAULT_RENDER_MODE).strip().lower()
+    if mode not in RENDER_MODES:
+        raise ValueError(f"unknown render mode {mode!r}; expected one of {', '.join(RENDER_MODES)}")
+    return mode
+
+
+def page_entries(page):
+    """(book dict or None, score or None, record or book, raw item) for each item of a ResultPage"""
+    for position, item in enumerate(page.items):
+        record = page.records[position] if position < len(page.records) else None
+        if isinstance(item, dict):
+            yield item, None, record or item, item
+        elif isinstance(item, tuple) and len(item) == 2:
+            book_ref, score = item
+            if not isinstance(book_ref, dict):
+                try:
+                    book_ref = converFact_to_string(book_ref)
+                except Exception:
+                    yield None, score, None, item
+                    continue
+            yield book_ref, score, record or book_ref, item
+        else:
+            yield None, None, None, item
+
+
+def explained_entries(page, query):
+    """page_entries with the explanations for the whole page computed at once.
+
+    When the tier recorded a scoring.Match per item, each explanation is just
+    its template filled in; otherwise the page is compared with the query.
+    """
+    entries = list(page_entries(page))
+    matches = page.matches
+    if matches is not None and len(matches) == len(entries) == len(page.records) and None not in page.records:
+        return [(book, score, explain_match(record.book, match) if source is not None else "", item)
+                for (book, score, source, item), record, match in zip(entries, page.records, matches)]
+    explanations = iter(explain_recommendations([explained for _, _, explained, _ in entries if explained is not None],
+                                                query))
+    return [(book, score, next(explanations) if source is not None else "", item)
+            for book, score, source, item in entries]
+
+
+def page_markdown(page, query, start=1):
+    """The compact view of one ResultPage as a single markdown string"""
+    return "\n\n".join(book_markdown(number, book, score, explanation, item)
+                        for number, (book, score, explanation, item)
+                        in enumerate(explained_entries(page, query), start))
+
+
+def render_page(ui, page, query, start=1, mode=None, markdown=None):
+    """Draw one ResultPage numbered from `start`; `markdown` is its page_markdown, if already built"""
+    if render_mode(mode) == "compact":
+        ui.markdown(markdown if markdown is not None else page_markdown(page, query, start))
+    else:
+        for number, (book, score, explanation, item) in enumerate(explained_entries(page, query), start):
+            render_detailed(ui, number, book, score, explanation, item)
+
+
+def book_markdown(number, book, score, explanation, item=None):
+    """One book of the compact view"""
+    if book is None:
+        return f"---\n### **{number}. Book Recommendation**\n\nBook data: `{item!r}`"
+    lines = ["---", f"### **{number}. {book.get('title', 'Unknown Title')}**",
+             f"**Author**: {book.get('author', 'Unknown Author')} · "
+             f"**Category**: {book.get('category', 'Unknown Category')}"]
+    if score is not None:
+        lines.append(f"**Confidence Level**: {score}%")
+    rating = book.get('rating')
+    if rating:
+        lines.append(f"**Rating**: {rating} ⭐")
+    if explanation:
+        lines.append(f"💡 **Why this book?** {explanation}")
+    details = [f"Target Audience: {book.get('target_audience', 'N/A')}",
+               f"Language: {book.get('language', 'Unknown Language')}",
+               f"Book Type: {book.get('book_type', 'N/A')}"]
+    keywords = book.get('keywords', [])
+    if keywords:
+        details.append("Keywords: " + (', '.join(str(k) for k in keywords)
+                                       if isinstance(keywords, (list, tuple, set)) else str(keywords)))
+    lines.append("_" + " · ".join(details) + "_")
+    return "  \n".join(lines)
+
+
+def render_detailed(ui, number, book, score, explanation, item):
+    """One book as separate widgets, with its details in an expander"""
+    ui.write("---")
+    ui.write(f"### **{number}. Book Recommendation**")
+    if score is not None:
+        ui.write(f"**Confidence Level**: {score}%")
+    if book is None:
+        # Fallback for any other format
+        ui.write("Book data:", item)
+        return
+    display_book_details(ui, book, number, explanation)
+
+
+def display_book_details(ui, book: dict, index: int, explanation: str = ""):
+    """Display book details in a formatted way with explanation"""
+    # Create columns for better layout
+    col1, col2 = ui.columns([3, 1])
+
+    with col1:
+        ui.write(f"**Title**: {book.get('title', 'Unknown Title')}")
+        ui.write(f"**Author**: {book.get('author', 'Unknown Author')}")
+        ui.write(f"**Category**: {book.get('category', 'Unknown Category')}")
+
+        # Show explanation if provided
+        if explanation:
+            ui.info(f"💡 **Why this book?** {explanation}")
+
+        # Show rating if available
+        rating = book.get('rating')
+        if rating:
+            ui.write(f"**Rating**: {rating} ⭐")
+
+        # Show additional details in expander
+        with ui.expander("More details"):
+            ui.write(f"**Target Audience**: {book.get('target_audience', 'N/A')}")
+            ui.write(f"**Language**: {book.get('language', 'Unknown Language')}")
+            ui.write(f"**Book Type**: {book.get('book_type', 'N/A')}")
+            keywords = book.get('keywords', [])
+            if keywords:
+                if isinstance(keywords, (list, tuple, set)):
+                    keywords_str = ', '.join(str(k) for k in keywords)
+                else:
+                    keywords_str = str(keywords)
+                ui.write(f"**Keywords**: {keywords_str}")
+
+    with col2:
+        ui.markdown("📖")
@@ -0,0 +1,196 @@
+# rete.py
+"""
+A Rete-native recommendation engine: catalog books are facts, and every
+criterion of the query is a join in experta's network.
+
+LibraryExpertSystem matches one user BookFact and does the catalog work in
+Python (indexes and columns) inside its rule bodies. ReteLibraryExpertSystem
+instead keeps a CatalogBook fact per book (plus a BookKeyword fact per
+keyword) declared for as long as the engine lives. A query's BookFact is
+expanded into Criterion / QueryKeyword / QueryRating facts, and one rule per
+field joins them against the books, so the network's memories hold the
+catalog between queries and only the query facts are retracted and
+re-declared. The rule bodies just record which books matched what; the
+final rule ranks those candidates with the usual scoring functions.
+
+Pick it per deployment with LIBRARY_ENGINE=rete (see recommender.py).
+"""
+from collections import defaultdict
+
+from experta import AS, MATCH, TEST, W, Fact, Rule
+
+from catalog import INDEXED_FIELDS, RATING_TOLERANCE, expanded_keywords, match_keywords
+from controller import ExactMatches, LazyBooks, converFact_to_string
+from facts import BookFact
+from main import (ALTERNATIVES_LIMIT, ALTERNATIVES_MESSAGE, EXACT_MESSAGE, NO_MATCH_MESSAGE,
+                  LibraryEngineBase)
+from ranking import rank
+from scoring import FIELD_BITS, RATING_BIT, alternative_score, alternative_upper_bound, result_match
+from tracing import logger
+
+
+class CatalogBook(Fact):
+    """A compiled catalog book: its id plus the normalized fields"""
+
+
+class BookKeyword(Fact):
+    """One normalized keyword of a catalog book"""
+
+
+class Criterion(Fact):
+    """One text preference of the current query (field, normalized value)"""
+
+
+class QueryKeyword(Fact):
+    """One normalized keyword of the current query"""
+
+
+class QueryRating(Fact):
+    """The rating of the current query"""
+
+
+# Any user BookFact. A bare BookFact() pattern would carry the keywords /
+# rating defaults BookFact.__init__ fills in, and only match empty requests.
+ANY_REQUEST = dict(keywords=W(), rating=W())
+
+
+def _field_rule(field):
+    """Rule joining a Criterion on `field` with the books having that value"""
+    @Rule(Criterion(field=field, value=MATCH.value),
+          CatalogBook(book_id=MATCH.book_id, **{field: MATCH.value}),
+          salience=5)
+    def match_field(self, book_id, value):
+        self.field_matches[book_id].add(field)
+    return match_field
+
+
+class ReteLibraryExpertSystem(LibraryEngineBase):
+    """Long-lived engine whose Rete network holds the catalog.
+
+    reset() only retracts the previous query's facts; the catalog facts are
+    declared once, and again only when the catalog's version changes.
+    """
+
+    def __init__(self, knowledge_base, catalog=None):
+        super().__init__(knowledge_base, catalog)
+        self._declared_version = None
+        self._query_facts = []
+        self._clear_matches()
+
+    def _clear_matches(self):
+        self.query = None
+        self.field_matches = defaultdict(set)  # book id -> fields equal to the query's
+        self.keyword_hits = defaultdict(set)  # book id -> catalog keywords matching a query keyword
+        self.rating_matches = set()  # book ids within RATING_TOLERANCE of the query rating
+
+    def reset(self, **kwargs):
+        """Retract the previous query's facts, keeping the catalog in the network"""
+        if self._declared_version != self.catalog.version:
+            super().reset(**kwargs)
+            self.declare(*self._catalog_facts())
+            self._declared_version = self.catalog.version
+        else:
+            for fact in self._query_facts:
+                self.retract(fact)
+        self._query_facts = []
+        self._clear_matches()
+
+    def _catalog_facts(self):
+        for book_id, record in enumerate(self.catalog.records):
+            if record is None:
+                continue
+            yield CatalogBook(book_id=book_id, rating=record.rating,
+                              **{field: getattr(record, field) for field in INDEXED_FIELDS})
+            for kw in record.keywords:
+                yield BookKeyword(book_id=book_id, keyword=kw)
+
+    # --------------------------
+    # Rule: turn the user's BookFact into one fact per criterion
+    # --------------------------
+    @Rule(AS.request << BookFact(**ANY_REQUEST), salience=20)
+    def expand_request(self, request):
+        self.query = query = self.catalog.compile_query(request.as_dict())
+        facts = [Criterion(field=field, value=getattr(query, field))
+                 for field in INDEXED_FIELDS if getattr(query, field)]
+        # One fact per catalog keyword the query keywords (fuzzily) match
+        facts += [QueryKeyword(keyword=kw) for kw in sorted(expanded_keywords(query))]
+        if query.rating is not None:
+            facts.append(QueryRating(rating=query.rating))
+        self._query_facts.append(request)
+        for fact in facts:
+            declared = self.declare(fact)
+            if declared is not None:
+                self._query_facts.append(declared)
+        logger.debug("🚀 expand_request: %d criteria facts", len(facts))
+
+    # --------------------------
+    # Rules: one join per criterion
+    # --------------------------
+    match_category = _field_rule("category")
+    match_author = _field_rule("author")
+    match_target_audience = _field_rule("target_audience")
+    match_language = _field_rule("language")
+    match_book_type = _field_rule("book_type")
+
+    @Rule(QueryKeyword(keyword=MATCH.keyword),
+          BookKeyword(book_id=MATCH.book_id, keyword=MATCH.keyword),
+          salience=5)
+    def match_keyword(self, book_id, keyword):
+        self.keyword_hits[book_id].add(keyword)
+
+    @Rule(QueryRating(rating=MATCH.rating),
+          CatalogBook(book_id=MATCH.book_id, rating=MATCH.book_rating),
+          TEST(lambda rating, book_rating: abs(book_rating - rating) <= RATING_TOLERANCE),
+          salience=5)
+    def match_rating(self, book_id, rating, book_rating):
+        self.rating_matches.add(book_id)
+
+    def _matched_fields(self, book_id):
+        """scoring.Match mask of the field and rating joins a book took part in"""
+        fields = RATING_BIT if book_id in self.rating_matches else 0
+        for field in self.field_matches.get(book_id, ()):
+            fields |= FIELD_BITS[field]
+        return fields
+
+    # --------------------------
+    # Rule: rank what the joins found, after all of them have fired
+    # --------------------------
+    @Rule(BookFact(**ANY_REQUEST), salience=-10)
+    def rank_matches(self):
+        with self.trace.rule("rank_matches") as stats:
+            query, records = self.query, self.catalog.records
+            required = {field for field in INDEXED_FIELDS if getattr(query, field)}
+            strong_keywords = match_keywords(query)
+            if not required and not query.keywords and not query.rating:
+                # No criteria: every book matches exactly, as in exact_match
+                candidates = [i for i, record in enumerate(records) if record is not None]
+                exact = candidates
+            else:
+                candidates = sorted(self.field_matches.keys() | self.keyword_hits.keys() | self.rating_matches)
+                exact = [i for i in candidates
+                         if self.field_matches[i] >= required
+                         and (not query.keywords or self.keyword_hits[i] & strong_keywords)
+                         and (not query.rating or i in self.rating_matches)]
+            stats.examined = len(candidates)
+
+            if exact:
+                exact_records = self.catalog.select(exact)
+                stats.matched = len(exact_records)
+                self.result.update(EXACT_MESSAGE, LazyBooks(exact_records), exact_records, "exact",
+                                   ExactMatches(exact_records, query))
+                return
+
+            # Only books that some join matched can score; rank them in catalog order
+            top = rank(candidates, lambda i: alternative_score(records[i], query),
+                       ALTERNATIVES_LIMIT, upper_bound=alternative_upper_bound(query))
+            ranked = top.results()
+            stats.matched = top.candidates
+            if ranked:
+                # The joins already recorded what each winner matched
+                keywords = expanded_keywords(query)
+                matches = [result_match(records[i], self._matched_fields(i), keywords) for i, _ in ranked]
+                self.result.update(ALTERNATIVES_MESSAGE,
+                                   [(converFact_to_string(records[i].book), score) for i, score in ranked],
+                                   [records[i] for i, _ in ranked], "alternatives", matches)
+            else:
+                self.result.update(NO_MATCH_MESSAGE, [], [], "none")
@@ -0,0 +1,234 @@
+# scoring.py
+import math
+from collections import namedtuple
+
+from catalog import INDEXED_FIELDS, RATING_TOLERANCE, expanded_keywords, keyword_tenths
+from ranking import Ranking, TopK, rank
+
+# What one pass over the catalog found for every tier below exact: Rankings
+# of (record, score) for the alternatives and the fallback search, and the
+# first records sharing the category or author, with their Matches.
+Tiers = namedtuple("Tiers", ("alternatives", "fallback", "partial", "partial_matches"), defaults=(None,))
+
+# Bit of each criterion in a Match's `fields` mask
+FIELD_BITS = {field: 1 << bit for bit, field in enumerate(INDEXED_FIELDS)}
+RATING_BIT = 1 << len(INDEXED_FIELDS)
+
+# What one result matched, recorded while it was scored so that explaining
+# it needs no second comparison: a mask of FIELD_BITS / RATING_BIT and the
+# catalog keywords it shares with the query's expanded keywords.
+Match = namedtuple("Match", ("fields", "keywords"))
+NO_MATCH = Match(0, ())
+
+# The fallback awards full rating points within this window, half within RATING_TOLERANCE
+FALLBACK_CLOSE_RATING = 0.3
+
+
+def match_points(record, query):
+    """Compare a BookRecord with the query once, for every tier.
+
+    Returns (relevance, fallback points, related, fields): the
+    suggest_alternatives relevance and the fallback points, both in tenths
+    so that fuzzy keyword matches, which score in tenths of a keyword, stay
+    whole numbers, whether the book shares the category or author
+    (partial_match), and the Match mask of the criteria it met.
+    """
+    relevance = points = fields = 0
+    related = False
+
+    # Keyword matching (partial matches)
+    if query.keywords:
+        tenths = keyword_tenths(record.keywords, query)
+        relevance += tenths * 2
+        points += tenths * 5
+
+    # Field matching
+    if query.category and record.category == query.category:
+        relevance += 30
+        points += 100
+        fields |= FIELD_BITS["category"]
+        related = True
+    if query.author and record.author == query.author:
+        relevance += 30
+        points += 100
+        fields |= FIELD_BITS["author"]
+        related = True
+    if query.target_audience and record.target_audience == query.target_audience:
+        relevance += 20
+        points += 50
+        fields |= FIELD_BITS["target_audience"]
+    if query.language and record.language == query.language:
+        relevance += 10
+        points += 30
+        fields |= FIELD_BITS["language"]
+    if query.book_type and record.book_type == query.book_type:
+        relevance += 20
+        points += 20
+        fields |= FIELD_BITS["book_type"]
+    # Rating match (with tolerance): the fallback gives full points within ±0.3, half within ±0.5
+    if query.rating is not None:
+        distance = abs(record.rating - query.rating)
+        if distance <= RATING_TOLERANCE:
+            relevance += 20 if query.rating else 0
+            points += 60 if distance <= FALLBACK_CLOSE_RATING else 30
+            fields |= RATING_BIT
+    return relevance, points, related, fields
+
+
+def query_fields(query):
+    """Match mask of every criterion the query gives: what each exact match meets"""
+    fields = 0
+    for field, bit in FIELD_BITS.items():
+        if getattr(query, field):
+            fields |= bit
+    return fields | (RATING_BIT if query.rating else 0)
+
+
+def result_match(record, fields, keywords):
+    """The Match of a result whose `fields` mask the scorer found; `keywords` is expanded_keywords(query)"""
+    return Match(fields, tuple(record.keywords & keywords) if keywords else ())
+
+
+def match_record(record, query, keywords=None):
+    """The Match of a record nobody scored yet, by comparing it with the query"""
+    if keywords is None:
+        keywords = expanded_keywords(query)
+    return result_match(record, match_points(record, query)[3], keywords)
+
+
+def alternative_score(record, query):
+    """suggest_alternatives relevance (0-100) of a BookRecord, or None if nothing matches"""
+    return _alternative(match_points(record, query)[0])
+
+
+def _alternative(relevance):
+    # Only include books with some relevance
+    return min(100, relevance) if relevance > 0 else None
+
+
+def alternative_upper_bound(query):
+    """Best alternative_score any book could reach for this query"""
+    best_possible = (len(query.keywords) * 2 + (3 if query.category else 0) + (3 if query.author else 0)
+                     + (2 if query.target_audience else 0) + (1 if query.language else 0)
+                     + (2 if query.book_type else 0) + (2 if query.rating else 0))
+    return min(100, best_possible * 10)
+
+
+def fallback_total(query):
+    """Points available for the criteria the user actually provided"""
+    total_possible = 0
+    if query.category:
+        total_possible += 10
+    if query.author:
+        total_possible += 10
+    if query.rating is not None:
+        total_possible += 6
+    # Maximum possible keyword score is 5 points per provided keyword
+    total_possible += 5 * len(query.keywords)
+    if query.target_audience:
+        total_possible += 5
+    if query.language:
+        total_possible += 3
+    if query.book_type:
+        total_possible += 2
+    return total_possible
+
+
+def fallback_score(record, query, total_possible):
+    """Weighted match percentage used by the fallback search, or None if nothing matches"""
+    return _fallback(match_points(record, query)[1], total_possible)
+
+
+def _fallback(points, total_possible):
+    if points <= 0:
+        return None
+    # Normalize to percentage based on total_possible points for the provided criteria
+    percentage = math.floor((points / (total_possible * 10)) * 100) if total_possible > 0 else 0
+    # Cap percentage to 100
+    return min(percentage, 100)
+
+
+def partial_match(record, query):
+    """Last-resort test: same category or same author"""
+    return bool((query.category and record.category == query.category)
+                or (query.author and record.author == query.author))
+
+
+def rank_alternatives(catalog, query, k):
+    """Top k (record, alternative_score) pairs; vectorized when NumPy is available"""
+    columns = catalog.columns
+    if columns is not None:
+        from columnar import top_k_indices
+        scores = columns.alternative_scores(query)
+        ids, candidates = top_k_indices(scores, k)
+        return Ranking([(catalog.records[i], int(scores[i])) for i in ids], len(catalog), candidates)
+    # The upper bound lets rank() stop once the top k can't improve
+    top = rank(catalog.live_records(), lambda record: alternative_score(record, query), k,
+               upper_bound=alternative_upper_bound(query))
+    return Ranking(top.results(), top.examined, top.candidates)
+
+
+def rank_fallback(catalog, query, k):
+    """Top k (record, fallback_score) pairs; vectorized when NumPy is available"""
+    total_possible = fallback_total(query)
+    columns = catalog.columns
+    if columns is not None:
+        from columnar import top_k_indices
+        scores = columns.fallback_scores(query, total_possible)
+        ids, candidates = top_k_indices(scores, k, threshold=-1)
+        return Ranking([(catalog.records[i], int(scores[i])) for i in ids], len(catalog), candidates)
+    top = rank(catalog.live_records(), lambda record: fallback_score(record, query, total_possible), k)
+    return Ranking(top.results(), top.examined, top.candidates)
+
+
+def score_tiers(catalog, query, alternatives_limit, fallback_limit, partial_limit):
+    """The alternatives, fallback and partial tiers from a single pass over the catalog.
+
+    Each book is compared with the query once and the comparison feeds all
+    three tiers, so a query that falls through to the last tier costs one
+    scan instead of three. Same results as rank_alternatives, rank_fallback
+    and the first partial_match books.
+    """
+    total_possible = fallback_total(query)
+    keywords = expanded_keywords(query)
+    columns = catalog.columns
+    if columns is not None:
+        from columnar import top_k_indices
+        alternatives, fallback, related, fields = columns.tier_scores(query, total_possible)
+        alternative_ids, alternative_candidates = top_k_indices(alternatives, alternatives_limit)
+        fallback_ids, fallback_candidates = top_k_indices(fallback, fallback_limit, threshold=-1)
+        partial_ids = related[:partial_limit].tolist()
+        records = catalog.records
+
+        def matches(ids):
+            return [result_match(records[i], int(fields[i]), keywords) for i in ids]
+
+        return Tiers(
+            Ranking([(records[i], int(alternatives[i])) for i in alternative_ids], len(catalog), alternative_candidates,
+                    matches(alternative_ids)),
+            Ranking([(records[i], int(fallback[i])) for i in fallback_ids], len(catalog), fallback_candidates,
+                    matches(fallback_ids)),
+            [records[i] for i in partial_ids],
+            matches(partial_ids),
+        )
+
+    # Each heap entry carries the record's Match mask along with it
+    alternatives, fallback, partial = TopK(alternatives_limit), TopK(fallback_limit), []
+    examined = 0
+    for position, record in enumerate(catalog.live_records()):
+        examined += 1
+        relevance, points, related, fields = match_points(record, query)
+        if relevance > 0:
+            alternatives.offer(position, min(100, relevance), (record, fields))
+        if points > 0:
+            fallback.offer(position, _fallback(points, total_possible), (record, fields))
+        if related and len(partial) < partial_limit:
+            partial.append((record, fields))
+
+    def ranking(top):
+        results = top.results()
+        return Ranking([(record, score) for (record, _), score in results], examined, top.candidates,
+                       [result_match(record, fields, keywords) for (record, fields), _ in results])
+
+    return Tiers(ranking(alternatives), ranking(fallback), [record for record, _ in partial],
+                 [result_match(record, fields, keywords) for record, fields in partial])
@@ -0,0 +1,255 @@
+# server.py
+"""
+HTTP/JSON recommendation service.
+
+    python server.py --port 8080 --workers 4 [--catalog books.csv] [--engine rete]
+
+    POST /recommend   the seven preference fields as a JSON object, plus
+                      optional "cursor" and "page_size" for paging
+    GET  /health      catalog size and version
+    GET  /stats       worker pool, coalescing and result cache counters
+    GET  /metrics     pipeline metrics in Prometheus text format (LIBRARY_METRICS=1)
+
+Connections are served by an asyncio front end; the recommendation itself
+runs on a bounded pool of worker threads sharing one EnginePool and one
+ResultCache. Identical queries that arrive while the first one is still
+being scored wait for that result instead of being scored again. Beyond
+`max_pending` distinct queries in flight, new ones get a 503.
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import profile_params
+from cache import ResultCache, cached_recommend, canonical_params, params_from_key
+from catalog import get_catalog
+from controller import PAGE_SIZE
+from loader import load_catalog
+from metrics import metrics
+from recommender import ENGINES, EnginePool
+from tracing import configure_tracing, logger
+
+# Worker threads (and pooled engines) by default
+WORKERS = 4
+# Distinct queries being scored or waiting for a worker before new ones are turned away
+MAX_PENDING = 256
+# Largest request body accepted
+MAX_BODY = 64 * 1024
+# Ratings a query may ask for; anything else, NaN and infinities included, is a 400
+MIN_RATING, MAX_RATING = 0.0, 5.0
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class ServiceBusy(Exception):
+    """Too many distinct queries in flight"""
+
+
+class RecommendationService:
+    """The recommendation pipeline behind an asyncio front end.
+
+    Scoring runs on `workers` threads, each borrowing an engine from a pool
+    of the same size. In-flight queries are coalesced on their canonical
+    user_params and the catalog version.
+    """
+
+    def __init__(self, catalog=None, workers=WORKERS, max_pending=MAX_PENDING, cache_size=10_000, engine=None):
+        self.catalog = catalog if catalog is not None else get_catalog()
+        self.pool = EnginePool(self.catalog, size=workers, mode=engine)
+        self.cache = ResultCache(maxsize=cache_size)
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="recommend")
+        self.workers = workers
+        self.max_pending = max_pending
+        self._in_flight = {}  # (canonical params, catalog version) -> asyncio.Future
+        self.requests = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def recommend(self, user_params):
+        """The RecommendationResult for user_params, shared with identical queries in flight"""
+        self.requests += 1
+        key = (canonical_params(user_params), self.catalog.version)
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+        if len(self._in_flight) >= self.max_pending:
+            self.rejected += 1
+            raise ServiceBusy(f"{len(self._in_flight)} queries in flight")
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, cached_recommend, params_from_key(key[0]), self.cache,
+                                      None, self.pool)
+        self._in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "in_flight": len(self._in_flight),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "cache": self.cache.stats(),
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    # --------------------------
+    # HTTP
+    # --------------------------
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it"""
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if method == "GET" and path.split("?", 1)[0] == "/metrics":
+                    writer.write(_response(200, metrics.prometheus_text(), keep_alive,
+                                           "text/plain; version=0.0.4; charset=utf-8"))
+                else:
+                    status, payload = await self.route(method, path, body)
+                    writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as error:
+            writer.write(_response(413 if "too large" in str(error) else 400, {"error": str(error)}, False))
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        """(status, JSON payload) for one request"""
+        path = path.split("?", 1)[0]
+        if path == "/recommend":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            return await self._recommend(body)
+        if path in ("/health", "/stats"):
+            if method != "GET":
+                return 405, {"error": "use GET"}
+            if path == "/health":
+                return 200, {"status": "ok", "books": len(self.catalog), "catalog_version": self.catalog.version}
+            return 200, self.stats()
+        return 404, {"error": f"no such endpoint: {path}"}
+
+    async def _recommend(self, body):
+        start = time.perf_counter()
+        try:
+            profile = json.loads(body or b"{}")
+            if not isinstance(profile, dict):
+                raise ValueError("expected a JSON object")
+            user_params = profile_params(profile)
+            rating = user_params["rating"]
+            # The comparison is False for NaN, so it is rejected along with the infinities
+            if rating is not None and not MIN_RATING <= rating <= MAX_RATING:
+                raise ValueError(f"rating must be between {MIN_RATING:g} and {MAX_RATING:g}, got {rating!r}")
+            cursor = max(0, int(profile.get("cursor") or 0))
+            page_size = max(1, int(profile.get("page_size") or PAGE_SIZE))
+        except (ValueError, TypeError, OverflowError) as error:
+            # OverflowError: int() of an infinite cursor or page size, such as 1e999
+            return 400, {"error": f"invalid request: {error}"}
+        try:
+            result = await self.recommend(user_params)
+            with metrics.timed("convert"):
+                payload = result.as_json(cursor, page_size)
+        except ServiceBusy as error:
+            return 503, {"error": f"busy: {error}"}
+        except Exception:
+            # Answer rather than drop the connection; the traceback goes to the log
+            logger.exception("/recommend failed for %r", user_params)
+            return 500, {"error": "internal error"}
+        logger.info("/recommend %s in %.1f ms", result.tier, (time.perf_counter() - start) * 1000)
+        return 200, payload
+
+
+async def _read_request(reader):
+    """(method, path, headers, body) of the next request, or None once the client is done"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as error:
+        if error.partial.strip():
+            raise ValueError("incomplete request") from None
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("request headers too large") from None
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, path, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise ValueError(f"malformed request line: {lines[0]!r}") from None
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def _response(status, payload, keep_alive=True, content_type="application/json; charset=utf-8"):
+    """One HTTP response; `payload` is JSON-encoded unless it is already text or encoded bytes"""
+    if isinstance(payload, bytes):
+        body = payload
+    else:
+        body = (payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def serve(service, host="127.0.0.1", port=8080, ready=None):
+    """Run the service until cancelled; `ready(address)` is called once it is listening"""
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    address = server.sockets[0].getsockname()
+    logger.info("serving %d books on http://%s:%d", len(service.catalog), address[0], address[1])
+    if ready is not None:
+        ready(address)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recommendations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=WORKERS, help="scoring threads and pooled engines")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="distinct queries in flight before answering 503")
+    parser.add_argument("--catalog", default=None, help="CSV/JSONL/.snap catalog file (default: facts.py)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=None,
+                        help="engine implementation (default: $LIBRARY_ENGINE or index)")
+    args = parser.parse_args(argv)
+
+    configure_tracing()
+    catalog = load_catalog(args.catalog)[0] if args.catalog else get_catalog()
+    service = RecommendationService(catalog, args.workers, args.max_pending, engine=args.engine)
+    print(f"📡 Serving {len(catalog)} books on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# snapshot.py
+"""
+Binary catalog snapshots that are memory-mapped instead of parsed.
+
+    python snapshot.py build books.jsonl books.snap   # or "facts" for facts.py
+    python snapshot.py info books.snap
+
+A snapshot holds the compiled catalog as flat arrays: integer-coded text
+fields with their string tables, a float32 rating column and the keyword
+incidence in CSR and CSC form. Opening one maps the file read-only and
+wraps the arrays without copying, so start-up does no parsing and every
+process that opens the same file shares its pages through the OS cache.
+
+Layout: 8-byte magic, uint64 header length, a JSON header naming each
+section's offset, dtype and length, then the sections, 8-byte aligned.
+"""
+import argparse
+import json
+import mmap
+import struct
+import sys
+import time
+
+import numpy as np
+
+from catalog import INDEXED_FIELDS, BookRecord, Catalog, ReadWriteLock, _versions
+from columnar import ColumnarCatalog
+from facts import Book
+
+MAGIC = b"LIBSNAP1"
+_PREFIX = struct.Struct("<8sQ")
+_ALIGN = 8
+
+# Code stored for a display field the book does not have
+_ABSENT = -1
+
+
+class StringTable:
+    """Strings stored as one UTF-8 blob plus offsets, sorted by their bytes.
+
+    Index i decodes string i; get() finds a string's index by binary search,
+    so a table doubles as a read-only vocabulary.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _bytes(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __getitem__(self, i):
+        return self._bytes(i).decode("utf-8")
+
+    def get(self, value, default=None):
+        key = value.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._bytes(lo) == key:
+            return lo
+        return default
+
+
+def _string_table(strings):
+    """(sorted strings, offsets, blob) for a collection of distinct strings"""
+    encoded = sorted(s.encode("utf-8") for s in strings)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return [b.decode("utf-8") for b in encoded], offsets, blob
+
+
+def _coded(values, strings=None):
+    """Integer codes into a sorted string table; None values get _ABSENT"""
+    strings, offsets, blob = _string_table(strings if strings is not None else
+                                           {v for v in values if v is not None})
+    lookup = {s: i for i, s in enumerate(strings)}
+    codes = np.fromiter((_ABSENT if v is None else lookup[v] for v in values), dtype=np.int32, count=len(values))
+    return codes, offsets, blob
+
+
+def _display(book, field):
+    value = book.get(field)
+    return str(value) if value not in (None, "") else None
+
+
+def write_snapshot(catalog, path):
+    """Write a compiled Catalog to `path` as a snapshot (removed books are left out)"""
+    records = list(catalog.live_records())
+    books = [record.book for record in records]
+    sections = {}
+
+    def add(name, array):
+        sections[name] = np.ascontiguousarray(array)
+
+    add("ratings", np.fromiter((r.rating for r in records), dtype=np.float32, count=len(records)))
+
+    # Normalized fields drive matching, display fields are what the UI shows
+    for field in INDEXED_FIELDS:
+        codes, offsets, blob = _coded([getattr(r, field) for r in records])
+        add(f"{field}.norm", codes)
+        add(f"{field}.norm.offsets", offsets)
+        add(f"{field}.norm.blob", blob)
+        codes, offsets, blob = _coded([_display(b, field) for b in books])
+        add(f"{field}.display", codes)
+        add(f"{field}.display.offsets", offsets)
+        add(f"{field}.display.blob", blob)
+
+    # Titles are mostly distinct, so they are stored per book in catalog order
+    titles = [(_display(b, "title") or "").encode("utf-8") for b in books]
+    offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+    np.cumsum([len(t) for t in titles], out=offsets[1:])
+    add("title.offsets", offsets)
+    add("title.blob", np.frombuffer(b"".join(titles), dtype=np.uint8))
+
+    # Normalized keywords: CSR per book and CSC per keyword over a sorted vocabulary
+    vocab, kw_offsets, kw_blob = _string_table({kw for r in records for kw in r.keywords})
+    lookup = {kw: i for i, kw in enumerate(vocab)}
+    lengths = np.fromiter((len(r.keywords) for r in records), dtype=np.int64, count=len(records))
+    kw_indptr = np.zeros(len(records) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=kw_indptr[1:])
+    kw_indices = np.fromiter((lookup[kw] for r in records for kw in sorted(r.keywords)),
+                             dtype=np.int32, count=int(kw_indptr[-1]))
+    rows = np.repeat(np.arange(len(records), dtype=np.int32), lengths)
+    kw_books = rows[np.argsort(kw_indices, kind="stable")]
+    kw_books_indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(kw_indices, minlength=len(vocab)), out=kw_books_indptr[1:])
+    add("kw.indptr", kw_indptr)
+    add("kw.indices", kw_indices)
+    add("kw.books.indptr", kw_books_indptr)
+    add("kw.books", kw_books)
+    add("kw.offsets", kw_offsets)
+    add("kw.blob", kw_blob)
+
+    # Keywords as the books spell them, for display
+    display_kws = [sorted({str(k) for k in (b.get("keywords") or ())}) for b in books]
+    codes, offsets, blob = _coded([kw for kws in display_kws for kw in kws])
+    indptr = np.zeros(len(books) + 1, dtype=np.int64)
+    np.cumsum([len(kws) for kws in display_kws], out=indptr[1:])
+    add("kw.display.indptr", indptr)
+    add("kw.display", codes)
+    add("kw.display.offsets", offsets)
+    add("kw.display.blob", blob)
+
+    header = {"count": len(records), "sections": {}}
+    position = 0
+    for name, array in sections.items():
+        header["sections"][name] = [position, array.dtype.str, len(array)]
+        position += -(-array.nbytes // _ALIGN) * _ALIGN
+    # Offsets above are relative to the data start, which follows the header
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(_PREFIX.size + len(header_bytes)) % _ALIGN)
+    with open(path, "wb") as handle:
+        handle.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+        handle.write(header_bytes)
+        for array in sections.values():
+            handle.write(array.tobytes())
+            handle.write(b"\0" * (-array.nbytes % _ALIGN))
+
+
+class SnapshotBooks:
+    """Read-only sequence of Books decoded from a snapshot on access"""
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._snapshot.book(i)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class SnapshotRecords(SnapshotBooks):
+    """Read-only sequence of BookRecords decoded from a snapshot on access,
+    of every entry or only of the entries `ids`"""
+
+    def __init__(self, snapshot, ids=None):
+        super().__init__(snapshot)
+        self._ids = ids
+
+    def __len__(self):
+        return len(self._snapshot) if self._ids is None else len(self._ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self._snapshot.record(i if self._ids is None else int(self._ids[i]))
+
+
+class SnapshotCatalog(Catalog):
+    """A Catalog backed by a memory-mapped snapshot file.
+
+    Matching and scoring run on the mapped columns (`index` is the
+    ColumnarCatalog, whose exact_candidates matches CatalogIndex's);
+    `books` and `records` decode single entries only when a result needs them.
+    Snapshots are read-only: rebuild one to change its books.
+    """
+
+    def __init__(self, path):
+        self.version = next(_versions)
+        self.path = path
+        self._lock = ReadWriteLock()
+        self._keyword_index = None
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _PREFIX.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header = json.loads(self._map[_PREFIX.size:_PREFIX.size + header_size])
+        base = _PREFIX.size + header_size
+        self._sections = {
+            name: np.frombuffer(self._map, dtype=np.dtype(dtype), count=length, offset=base + offset)
+            for name, (offset, dtype, length) in header["sections"].items()
+        }
+        self._size = header["count"]
+
+        s = self._sections
+        self._norm = {f: StringTable(s[f"{f}.norm.offsets"], s[f"{f}.norm.blob"]) for f in INDEXED_FIELDS}
+        self._display = {f: StringTable(s[f"{f}.display.offsets"], s[f"{f}.display.blob"])
+                         for f in INDEXED_FIELDS}
+        self._keywords = StringTable(s["kw.offsets"], s["kw.blob"])
+        self._display_keywords = StringTable(s["kw.display.offsets"], s["kw.display.blob"])
+        # float32 on disk; rounded back to the decimal the catalog gave so the
+        # +/-0.5 rating window behaves exactly as with the compiled records
+        ratings = np.round(s["ratings"].astype(np.float64), 6)
+
+        self._columns = ColumnarCatalog.from_arrays(
+            {f: s[f"{f}.norm"] for f in INDEXED_FIELDS}, self._norm, ratings,
+            s["kw.indptr"], s["kw.indices"], s["kw.books.indptr"], s["kw.books"], self._keywords,
+        )
+        self.index = self._columns
+        self.books = SnapshotBooks(self)
+        self.records = SnapshotRecords(self)
+
+    def __len__(self):
+        return self._size
+
+    def book(self, i):
+        """The Book of entry i; fields the source left out stay None"""
+        s = self._sections
+        title = s["title.blob"][s["title.offsets"][i]:s["title.offsets"][i + 1]].tobytes().decode("utf-8")
+        book = {"title": title} if title else {}
+        for field in INDEXED_FIELDS:
+            code = s[f"{field}.display"][i]
+            if code != _ABSENT:
+                book[field] = self._display[field][code]
+        lo, hi = s["kw.display.indptr"][i], s["kw.display.indptr"][i + 1]
+        book["keywords"] = {self._display_keywords[code] for code in s["kw.display"][lo:hi]}
+        book["rating"] = float(self._columns.ratings[i])
+        return Book(**book)
+
+    def record(self, i):
+        s = self._sections
+        lo, hi = s["kw.indptr"][i], s["kw.indptr"][i + 1]
+        return BookRecord(
+            self.book(i),
+            *(self._norm[field][s[f"{field}.norm"][i]] for field in INDEXED_FIELDS),
+            frozenset(self._keywords[code] for code in s["kw.indices"][lo:hi]),
+            float(self._columns.ratings[i]),
+        )
+
+    @property
+    def columns(self):
+        return self._columns
+
+    def keyword_vocabulary(self):
+        return (self._keywords[i] for i in range(len(self._keywords)))
+
+    def select(self, ids):
+        """The records of `ids`, decoded only as a result's pages are read; the snapshot never changes"""
+        return SnapshotRecords(self, ids)
+
+    def apply(self, events):
+        raise TypeError(f"{self.path} is a read-only snapshot; update the source catalog and rebuild it")
+
+    def close(self):
+        self._sections = self._columns = self.index = None
+        self._map.close()
+
+
+def open_snapshot(path):
+    """Map a snapshot file as a SnapshotCatalog"""
+    return SnapshotCatalog(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect binary catalog snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a catalog file into a snapshot")
+    build.add_argument("source", help='CSV/JSONL catalog file, or "facts" for the books in facts.py')
+    build.add_argument("output", help="snapshot file to write")
+    info = commands.add_parser("info", help="open a snapshot and describe it")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if args.source == "facts":
+            from catalog import get_catalog
+            catalog = get_catalog()
+        else:
+            from loader import load_catalog
+            catalog, report = load_catalog(args.source)
+            print(report, file=sys.stderr)
+        start = time.perf_counter()
+        write_snapshot(catalog, args.output)
+        print(f"💾 {args.output}: {len(catalog)} books in {time.perf_counter() - start:.2f}s")
+    else:
+        start = time.perf_counter()
+        catalog = open_snapshot(args.path)
+        elapsed = time.perf_counter() - start
+        print(f"💾 {args.path}: {len(catalog)} books, {len(catalog._keywords)} keywords, "
+              f"{catalog._map.size() / (1024 * 1024):.1f} MB, opened in {elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# synthetic.py
+"""
+Seeded synthetic catalogs shaped like the real one in facts.py.
+
+    python synthetic.py 1000000 -o books.jsonl [--seed 0]
+
+CatalogProfile measures the sample catalog: how skewed the categories are,
+which keywords each category uses and how often, how many keywords a book
+has, the audience, book type and language frequencies, the ratings, and how
+many books an author writes. synthetic_books() draws from those
+distributions, so a million generated books have the same shape as the 87
+real ones rather than being 87 templates copied over and over:
+
+- categories, audiences, book types and languages keep their real
+  frequencies (and cardinalities: no invented categories);
+- keywords are drawn per category with their real frequencies; past the
+  size of the sample the vocabulary keeps growing like real text does
+  (Heaps' law), through long-tail variants "<keyword> <n>";
+- ratings are real ratings jittered by ±0.1;
+- authors are drawn log-uniformly from a pool that grows with the catalog,
+  so a few authors have many books and most have one or two.
+
+The same size and seed always give the same books. QUERY_MIX is the fixed
+set of queries the scaling suite (python benchmark.py suite) runs against
+generated catalogs.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+from bisect import bisect
+from collections import Counter, defaultdict
+from itertools import accumulate
+
+from catalog import book_value
+from facts import knowledge_base
+
+# Heaps' law exponent: the keyword vocabulary grows like size ** HEAPS_BETA
+HEAPS_BETA = 0.5
+# Share of keywords drawn from the long tail once the catalog outgrows the sample
+TAIL_SHARE = 0.3
+# How far a rating is moved from the real rating it was drawn from
+RATING_JITTER = 0.1
+
+# A fixed mix of selective, broad, fuzzy and unmatchable queries; every value
+# comes from the real catalog, so it hits generated catalogs of any size
+QUERY_MIX = [
+    {"category": "Fiction"},
+    {"category": "Technology", "keywords": {"machine learning"}, "rating": 4.7},
+    {"author": "Yuval Noah Harari"},
+    {"keywords": {"Machine-Learning", "pyth"}},
+    {"target_audience": "Adults", "book_type": "Hardcover", "rating": 4.5},
+    {"language": "English"},
+    {"category": "Data Science", "target_audience": "Artists", "book_type": "eBook", "keywords": {"dragons"}},
+    {"rating": 4.9},
+]
+
+
+class Distribution:
+    """Weighted choice over a fixed set of values, one bisect per draw"""
+    __slots__ = ("values", "cumulative", "total")
+
+    def __init__(self, counts):
+        self.values = list(counts)
+        self.cumulative = list(accumulate(counts[value] for value in self.values))
+        self.total = self.cumulative[-1]
+
+    def __len__(self):
+        return len(self.values)
+
+    def draw(self, rng):
+        return self.values[bisect(self.cumulative, rng.random() * self.total)]
+
+
+class CatalogProfile:
+    """The distributions of a catalog that synthetic_books() reproduces"""
+
+    def __init__(self, categories, keywords, keyword_counts, titles, authors, audiences, book_types, languages,
+                 ratings, books_per_author):
+        self.categories = categories  # Distribution of category
+        self.keywords = keywords  # category -> Distribution of keyword
+        self.keyword_counts = keyword_counts  # Distribution of keywords per book
+        self.titles = titles  # category -> [title]
+        self.authors = authors  # [author], most prolific first
+        self.audiences = audiences
+        self.book_types = book_types
+        self.languages = languages
+        self.ratings = ratings  # [rating] as they occur
+        self.books_per_author = books_per_author
+        self.size = len(ratings)
+
+    @classmethod
+    def from_books(cls, books):
+        categories, audiences, book_types, languages, author_counts = (Counter() for _ in range(5))
+        keywords, titles = defaultdict(Counter), defaultdict(list)
+        keyword_counts, ratings, size = Counter(), [], 0
+        for book in books:
+            size += 1
+            category = book_value(book, "category")
+            categories[category] += 1
+            titles[category].append(book_value(book, "title"))
+            author_counts[book_value(book, "author")] += 1
+            audiences[book_value(book, "target_audience")] += 1
+            book_types[book_value(book, "book_type")] += 1
+            languages[book_value(book, "language")] += 1
+            # Sorted: a set's order changes with the hash seed, and so would every draw
+            book_keywords = sorted(book_value(book, "keywords") or ())
+            keywords[category].update(book_keywords)
+            keyword_counts[len(book_keywords)] += 1
+            ratings.append(float(book_value(book, "rating")))
+        return cls(Distribution(categories), {category: Distribution(counts) for category, counts in keywords.items()},
+                   Distribution(keyword_counts), dict(titles), [author for author, _ in author_counts.most_common()],
+                   Distribution(audiences), Distribution(book_types), Distribution(languages), ratings,
+                   size / len(author_counts))
+
+    def tail_variants(self, size):
+        """Long-tail variants per real keyword for a catalog of `size` books"""
+        if size <= self.size:
+            return 0
+        return max(1, math.ceil((size / self.size) ** HEAPS_BETA))
+
+
+_profile = None
+
+
+def real_profile():
+    """The CatalogProfile of facts.py, measured once"""
+    global _profile
+    if _profile is None:
+        _profile = CatalogProfile.from_books(knowledge_base)
+    return _profile
+
+
+def synthetic_books(size, seed=0, profile=None):
+    """`size` book dicts drawn from `profile` (the real catalog's by default), generated lazily"""
+    profile = profile or real_profile()
+    rng = random.Random(seed)
+    tail = profile.tail_variants(size)
+    author_pool = max(1, round(size / profile.books_per_author))
+    authors = profile.authors
+    for i in range(size):
+        category = profile.categories.draw(rng)
+        vocabulary = profile.keywords.get(category)
+        keywords = set()
+        if vocabulary:
+            for _ in range(min(profile.keyword_counts.draw(rng), len(vocabulary))):
+                keyword = vocabulary.draw(rng)
+                if tail and rng.random() < TAIL_SHARE:
+                    keyword = f"{keyword} {rng.randrange(tail) + 1}"
+                keywords.add(keyword)
+        # Log-uniform over the pool: low numbers (the real names) come up most often
+        author = int(author_pool ** rng.random()) - 1
+        generation, author = divmod(author, len(authors))
+        rating = rng.choice(profile.ratings) + rng.uniform(-RATING_JITTER, RATING_JITTER)
+        yield {
+            "title": f"{rng.choice(profile.titles[category])} #{i}",
+            "category": category,
+            "author": f"{authors[author]} {generation}" if generation else authors[author],
+            "keywords": keywords,
+            "rating": round(min(5.0, max(0.0, rating)), 1),
+            "target_audience": profile.audiences.draw(rng),
+            "language": profile.languages.draw(rng),
+            "book_type": profile.book_types.draw(rng),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic catalog shaped like facts.py as JSONL.")
+    parser.add_argument("size", type=int, help="number of books")
+    parser.add_argument("-o", "--output", default="-", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    handle = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for book in synthetic_books(args.size, args.seed):
+            book["keywords"] = sorted(book["keywords"])
+            handle.write(json.dumps(book, ensure_ascii=False) + "\n")
+    finally:
+        if handle is not sys.stdout:
+            handle.close()
+    if handle is not sys.stdout:
+        print(f"📚 Wrote {args.size} books to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
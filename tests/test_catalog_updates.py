@@ -0,0 +1,190 @@
+# tests/test_catalog_updates.py
+"""Catalog.apply() against a full rebuild: after any mix of add, merge,
+update and remove events the catalog must answer queries exactly like a
+catalog compiled from its resulting books."""
+import random
+
+import pytest
+
+import keywords
+from catalog import Catalog, compile_query
+from recommender import recommend
+from scoring import rank_alternatives, rank_fallback
+from synthetic import QUERY_MIX, synthetic_books
+
+SIZE = 400
+
+
+def new_catalog(seed=0):
+    catalog = Catalog(list(synthetic_books(SIZE, seed)), rating_policy="max")
+    # Built up front, so updates patch the arrays and the fuzzy keyword index as well as the indexes
+    catalog.columns
+    catalog.keyword_index
+    return catalog
+
+
+def rebuilt(catalog):
+    return Catalog([book for book in catalog.books if book is not None], rating_policy="max")
+
+
+def assert_matches_rebuild(catalog, touched=()):
+    expected = rebuilt(catalog)
+    assert len(catalog) == len(expected)
+    queries = list(QUERY_MIX) + [
+        {"author": book.get("author"), "keywords": book.get("keywords"), "rating": book.get("rating")}
+        for book in touched
+    ]
+    for params in queries:
+        assert catalog.compile_query(params) == expected.compile_query(params), params
+        query = compile_query(params)
+        for index, expected_index in ((catalog.index, expected.index), (catalog.columns, expected.columns)):
+            got = [catalog.records[i] for i in index.exact_candidates(query)]
+            assert got == [expected.records[i] for i in expected_index.exact_candidates(query)], params
+        assert rank_alternatives(catalog, query, 5).results == rank_alternatives(expected, query, 5).results
+        assert rank_fallback(catalog, query, 10).results == rank_fallback(expected, query, 10).results
+        got, want = recommend(params, catalog), recommend(params, expected)
+        assert (got.tier, list(got.items)) == (want.tier, list(want.items)), params
+
+
+def live_book(catalog, position=0):
+    return [book for book in catalog.books if book is not None][position]
+
+
+def test_add():
+    catalog = new_catalog()
+    book = {"title": "A Brand New Book", "author": "Nobody Yet", "category": "Poetry", "keywords": {"verse"},
+            "rating": 4.4, "target_audience": "Adults", "language": "English", "book_type": "eBook"}
+    (book_id,) = catalog.apply([("add", book)])
+    assert book_id == SIZE and catalog.books[book_id]["title"] == "A Brand New Book"
+    assert_matches_rebuild(catalog, [book])
+
+
+def test_add_merges_a_known_book():
+    catalog = new_catalog()
+    original = live_book(catalog, 10)
+    copy = dict(original, keywords={"sequel"}, rating=5.0)
+    (book_id,) = catalog.apply([("add", copy)])
+    assert len(catalog) == SIZE
+    merged = catalog.books[book_id]
+    assert "sequel" in merged["keywords"] and merged["keywords"] >= original["keywords"]
+    assert merged["rating"] == 5.0
+    assert_matches_rebuild(catalog, [merged])
+
+
+def test_update():
+    catalog = new_catalog()
+    book = dict(live_book(catalog, 20), category="Poetry", keywords={"classic"}, rating=1.5)
+    (book_id,) = catalog.apply([("update", book)])
+    assert catalog.books[book_id]["category"] == "Poetry" and catalog.books[book_id]["rating"] == 1.5
+    assert_matches_rebuild(catalog, [book])
+
+
+def test_remove():
+    catalog = new_catalog()
+    book = live_book(catalog, 30)
+    (book_id,) = catalog.apply([("remove", {"title": book["title"], "author": book["author"]})])
+    assert catalog.books[book_id] is None and catalog.records[book_id] is None
+    assert len(catalog) == SIZE - 1
+    assert_matches_rebuild(catalog, [book])
+
+
+def test_removing_the_last_book_with_a_keyword():
+    catalog = new_catalog()
+    unique = {"title": "Gauge Theories", "author": "A Physicist", "keywords": {"quantum chromodynamics"}}
+    shared = {"title": "Quantum Basics", "author": "Another Physicist", "keywords": {"quantum"}}
+    catalog.apply([("add", unique), ("add", shared)])
+    assert "quantum chromodynamics" in dict(catalog.compile_query(keywords={"quant"}).keyword_weights[0])
+    catalog.apply([("remove", unique)])
+    assert "quantum chromodynamics" not in dict(catalog.compile_query(keywords={"quant"}).keyword_weights[0])
+    assert_matches_rebuild(catalog, [unique, shared])
+    catalog.apply([("add", unique)])
+    assert "quantum chromodynamics" in dict(catalog.compile_query(keywords={"quant"}).keyword_weights[0])
+    assert_matches_rebuild(catalog, [unique])
+
+
+def random_events(catalog, count, rng):
+    """A mix of add / merge / update / remove events against the catalog"""
+    fresh = iter(list(synthetic_books(SIZE + count, seed=99))[SIZE:])
+    live = [book for book in catalog.books if book is not None]
+    events = []
+    for _ in range(count):
+        position = rng.randrange(len(live))
+        book = live[position]
+        operation = rng.choice(("add", "merge", "update", "update", "remove"))
+        if operation == "add":
+            book = next(fresh)
+            live.append(book)
+        elif operation == "merge":
+            operation, book = "add", dict(book, keywords={"sequel"}, rating=round(rng.uniform(1, 5), 1))
+        elif operation == "update":
+            book = dict(book, rating=round(rng.uniform(1, 5), 1), category=rng.choice(("AI", "Fiction", "Poetry")),
+                        keywords=set(rng.sample(sorted(set(book["keywords"]) | {"classic", "new"}), 2)))
+            live[position] = book
+        else:
+            live.pop(position)
+        events.append((operation, book))
+    return events
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_many_updates_match_a_rebuild(seed):
+    catalog = new_catalog(seed)
+    events = random_events(catalog, 300, random.Random(seed))
+    for start in range(0, len(events), 25):
+        catalog.apply(events[start:start + 25])
+    assert_matches_rebuild(catalog, [book for _, book in events[-20:]])
+
+
+def test_many_updates_with_a_small_keyword_backlog(monkeypatch):
+    # Rebuilds the fuzzy keyword index often, for added and for dropped keywords
+    monkeypatch.setattr(keywords, "PENDING_LIMIT", 4)
+    catalog = new_catalog(1)
+    events = random_events(catalog, 300, random.Random(1))
+    for start in range(0, len(events), 25):
+        catalog.apply(events[start:start + 25])
+    assert_matches_rebuild(catalog, [book for _, book in events[-20:]])
+
+
+def test_apply_bumps_the_version_once_per_batch():
+    catalog = new_catalog()
+    version = catalog.version
+    catalog.apply([("update", dict(live_book(catalog), rating=2.0)), ("remove", live_book(catalog, 1))])
+    assert catalog.version != version
+    version = catalog.version
+    catalog.apply([])
+    assert catalog.version == version
+
+
+@pytest.mark.parametrize("bad_event, error", [
+    (("remove", {"title": "Not In The Catalog", "author": "Nobody"}), KeyError),
+    (("update", {"title": "Not In The Catalog", "author": "Nobody"}), KeyError),
+    (("rename", {"title": "Anything"}), ValueError),
+    (("add", {"author": "No Title"}), ValueError),
+    (("add", {"title": "Bad Rating", "rating": "high"}), ValueError),
+])
+def test_a_bad_event_changes_nothing(bad_event, error):
+    catalog = new_catalog()
+    version, books = catalog.version, list(catalog.books)
+    first, second = live_book(catalog, 0), live_book(catalog, 1)
+    events = [
+        ("add", {"title": "Added Before The Bad Event", "author": "Someone"}),
+        ("update", dict(first, rating=1.0)),
+        ("remove", second),
+        bad_event,
+    ]
+    with pytest.raises(error):
+        catalog.apply(events)
+    assert catalog.version == version
+    assert catalog.books == books
+    assert_matches_rebuild(catalog)
+
+
+def test_events_see_the_earlier_events_of_their_batch():
+    catalog = new_catalog()
+    book = live_book(catalog, 5)
+    added = {"title": "Fresh", "author": "New Author", "rating": 3.0}
+    # Removing a book the batch just added, or updating one it re-added, is valid
+    catalog.apply([("add", added), ("remove", added), ("remove", book), ("add", book), ("update", book)])
+    assert_matches_rebuild(catalog, [book])
+    with pytest.raises(KeyError):
+        catalog.apply([("remove", book), ("update", book)])
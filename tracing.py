@@ -0,0 +1,73 @@
+# tracing.py
+import logging
+import os
+import time
+
+# All engine tracing goes through this logger. It is quiet by default; set
+# LIBRARY_TRACE=info for one summary line per query, or =debug for the
+# per-rule details as well.
+logger = logging.getLogger("library_system")
+
+
+def configure_tracing(level=None):
+    """Set the trace level (a logging level or name); defaults to $LIBRARY_TRACE"""
+    level = level or os.environ.get("LIBRARY_TRACE") or "WARNING"
+    if isinstance(level, str):
+        level = logging.getLevelName(level.strip().upper())
+        if not isinstance(level, int):
+            level = logging.WARNING
+    logger.setLevel(level)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        # experta configures the root logger; don't print every line twice
+        logger.propagate = False
+    return level
+
+
+class RuleStats:
+    """Counters and wall time for one rule firing"""
+    __slots__ = ("name", "examined", "matched", "seconds", "_start")
+
+    def __init__(self, name):
+        self.name = name
+        self.examined = 0
+        self.matched = 0
+        self.seconds = 0.0
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        return False
+
+
+class QueryTrace:
+    """Per-query rule statistics, logged once as a compact summary.
+
+    Collecting the counters costs a couple of integer additions per rule;
+    nothing is formatted unless the logger is enabled.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.started = time.perf_counter()
+
+    def rule(self, name):
+        stats = RuleStats(name)
+        self.rules.append(stats)
+        return stats
+
+    def report(self):
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        total = time.perf_counter() - self.started
+        parts = ", ".join(
+            "%s %d/%d in %.2fms" % (r.name, r.matched, r.examined, r.seconds * 1000)
+            for r in self.rules
+        )
+        logger.info("📊 query %.2fms: %s", total * 1000, parts or "no rules fired")